@@ -2,6 +2,8 @@
 import subprocess
 import pandas as pd
 import os
+from weather_data_generator import generate_weather_data, save_weather_data
+from traffic_data_generator import generate_traffic_data, save_traffic_data
 
 def generate_all_data():
     """
@@ -13,12 +15,10 @@ def generate_all_data():
     
     # Generate weather data
     print("\n1. Generating Weather Dataset...")
-    from weather_data_generator import generate_weather_data, save_weather_data
     weather_df = generate_weather_data(5000)
     save_weather_data(weather_df, 'weather_data_raw.csv')
     
     print("\n2. Generating Traffic Dataset...")
-    from traffic_data_generator import generate_traffic_data, save_traffic_data
     traffic_df = generate_traffic_data(5000)
     save_traffic_data(traffic_df, 'traffic_data_raw.csv')
     
@@ -31,8 +31,7 @@ def generate_all_data():
     print(f"  Total records: {len(weather_df):,}")
     print(f"  Columns: {list(weather_df.columns)}")
     print(f"  Missing values per column:")
-    for col in weather_df.columns:
-        null_count = weather_df[col].isna().sum()
+    for col, null_count in weather_df.isna().sum().items():
         if null_count > 0:
             print(f"    - {col}: {null_count} ({null_count/len(weather_df)*100:.1f}%)")
     
@@ -40,8 +39,7 @@ def generate_all_data():
     print(f"  Total records: {len(traffic_df):,}")
     print(f"  Columns: {list(traffic_df.columns)}")
     print(f"  Missing values per column:")
-    for col in traffic_df.columns:
-        null_count = traffic_df[col].isna().sum()
+    for col, null_count in traffic_df.isna().sum().items():
         if null_count > 0:
             print(f"    - {col}: {null_count} ({null_count/len(traffic_df)*100:.1f}%)")
     
@@ -1,8 +1,26 @@
 # traffic_data_generator.py
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from datetime import datetime
+from functools import lru_cache
+
+@lru_cache(maxsize=8)
+def build_calendar(start_date, num_records):
+    """
+    Build the hourly structure that does not depend on the RNG: hour offsets,
+    their timestamps and the rush-hour mask. Cached per shape so repeated
+    runs only redraw the random parts; the arrays are read-only.
+    """
+    hours = np.arange(num_records)
+    base_dt = pd.Timestamp(start_date) + pd.to_timedelta(hours, 'h')
+    # Rush hours are 7-9 AM and 5-7 PM
+    hour_of_day = hours % 24
+    rush = ((hour_of_day >= 7) & (hour_of_day <= 9)) | ((hour_of_day >= 17) & (hour_of_day <= 19))
+    for arr in (hours, rush):
+        arr.flags.writeable = False
+    return hours, base_dt, rush
 
 def generate_traffic_data(num_records=5000):
     """
@@ -12,20 +30,6 @@ def generate_traffic_data(num_records=5000):
     london_areas = ['Camden', 'Chelsea', 'Islington', 'Southwark', 'Kensington', 
                     'Westminster', 'Greenwich', 'Hackney', 'Lambeth', 'Tower Hamlets',
                     'Wandsworth', 'Hammersmith', 'Brent', 'Ealing', 'Hounslow']
-    # Base data structures
-    data = {
-        'traffic_id': [],
-        'date_time': [],
-        'city': [],
-        'area': [],
-        'vehicle_count': [],
-        'avg_speed_kmh': [],
-        'accident_count': [],
-        'congestion_level': [],
-        'road_condition': [],
-        'visibility_m': []
-    }
-    
     # Congestion levels with probabilities
     congestion_levels = ['Low', 'Medium', 'High']
     congestion_probs = [0.6, 0.3, 0.1]
@@ -36,155 +40,162 @@ def generate_traffic_data(num_records=5000):
     # Start date (same as weather for merging later)
     start_date = datetime(2024, 1, 1, 0, 0)
     
-    # Generate base records
-    for i in range(num_records):
-        # Generate ID (9001, 9002, ...)
-        base_id = 9000 + i + 1
-        
-        # Decide if this record will have issues
-        has_issues = random.random() < 0.3  # 30% of records have issues
-        
-        # ----- traffic_id -----
-        if has_issues and random.random() < 0.1:  # 10% of problematic records
-            data['traffic_id'].append(None)  # NULL ID
-        else:
-            data['traffic_id'].append(base_id)
-        
-        # ----- date_time -----
-        # Generate time with more traffic during rush hours
-        hour_offset = i % 24
-        current_date = start_date + timedelta(hours=i, minutes=random.randint(0, 59))
-        
-        if has_issues:
-            # Introduce date format issues
-            rand_choice = random.random()
-            if rand_choice < 0.05:  # 5%: NULL timestamp
-                data['date_time'].append(None)
-            elif rand_choice < 0.1:  # 5%: Invalid format
-                invalid_formats = ['TBD', '2099-00-00 99:99', 'Unknown', 'N/A']
-                data['date_time'].append(random.choice(invalid_formats))
-            elif rand_choice < 0.2:  # 10%: Different format
-                formats = [
-                    current_date.strftime('%d/%m/%Y %I:%M%p'),  # 15/01/2024 8AM
-                    current_date.strftime('%Y-%m-%dT%H:%MZ'),   # 2024-01-15T08:00Z
-                    current_date.strftime('%d-%b-%Y %H:%M')     # 15-Jan-2024 08:00
-                ]
-                data['date_time'].append(random.choice(formats))
-            else:  # Standard format
-                data['date_time'].append(current_date.strftime('%Y-%m-%d %H:%M'))
-        else:
-            data['date_time'].append(current_date.strftime('%Y-%m-%d %H:%M'))
-        
-        # ----- city -----
-        if has_issues and random.random() < 0.05:  # 5% NULL city
-            data['city'].append(None)
-        else:
-            data['city'].append('London')
-        
-        # ----- area -----
-        if has_issues and random.random() < 0.1:  # 10% NULL area
-            data['area'].append(None)
-        else:
-            data['area'].append(random.choice(london_areas))
-        
-        # ----- vehicle_count -----
-        # More vehicles during rush hours (7-9 AM, 5-7 PM)
-        hour = current_date.hour
-        if 7 <= hour <= 9 or 17 <= hour <= 19:
-            base_vehicles = random.randint(1000, 5000)
-        else:
-            base_vehicles = random.randint(100, 2000)
-        
-        if has_issues and random.random() < 0.05:  # 5% extreme outliers
-            data['vehicle_count'].append(random.randint(20000, 50000))
-        elif has_issues and random.random() < 0.1:  # 10% NULL
-            data['vehicle_count'].append(None)
-        else:
-            data['vehicle_count'].append(base_vehicles)
-        
-        # ----- avg_speed_kmh -----
-        # Lower speed during high traffic
-        if base_vehicles > 3000:
-            base_speed = random.uniform(10, 40)
-        else:
-            base_speed = random.uniform(40, 120)
-        
-        if has_issues and random.random() < 0.05:  # 5% negative speeds
-            data['avg_speed_kmh'].append(random.uniform(-50, -1))
-        elif has_issues and random.random() < 0.1:  # 10% NULL
-            data['avg_speed_kmh'].append(None)
-        else:
-            data['avg_speed_kmh'].append(round(base_speed, 1))
-        
-        # ----- accident_count -----
-        # More accidents during bad weather (simulated by random here)
-        if has_issues and random.random() < 0.02:  # 2% extreme values
-            data['accident_count'].append(random.randint(50, 100))
-        elif has_issues and random.random() < 0.1:  # 10% NULL
-            data['accident_count'].append(None)
-        else:
-            # Higher probability during rush hours
-            if 7 <= hour <= 9 or 17 <= hour <= 19:
-                data['accident_count'].append(np.random.choice([0, 1, 2, 3, 4, 5], 
-                                                               p=[0.8, 0.1, 0.05, 0.03, 0.01, 0.01]))
-            else:
-                data['accident_count'].append(np.random.choice([0, 1, 2, 3], 
-                                                               p=[0.95, 0.03, 0.015, 0.005]))
-        
-        # ----- congestion_level -----
-        # Determine congestion based on vehicle count and speed
-        if has_issues and random.random() < 0.1:  # 10% NULL
-            data['congestion_level'].append(None)
-        elif has_issues and random.random() < 0.05:  # 5% incorrect categories
-            wrong_categories = ['Very High', 'Low-Medium', 'Heavy', 'Light', 'Severe']
-            data['congestion_level'].append(random.choice(wrong_categories))
-        else:
-            # Base on vehicle count and speed
-            if base_vehicles > 4000 and base_speed < 30:
-                data['congestion_level'].append('High')
-            elif base_vehicles > 2000 and base_speed < 50:
-                data['congestion_level'].append('Medium')
-            else:
-                data['congestion_level'].append('Low')
-        
-        # ----- road_condition -----
-        if has_issues and random.random() < 0.1:  # 10% NULL
-            data['road_condition'].append(None)
-        else:
-            data['road_condition'].append(random.choice(road_conditions))
-        
-        # ----- visibility_m -----
-        if has_issues and random.random() < 0.05:  # 5% extreme values
-            data['visibility_m'].append(random.choice([10, 100000]))
-        elif has_issues and random.random() < 0.1:  # 10% NULL
-            data['visibility_m'].append(None)
-        else:
-            data['visibility_m'].append(random.randint(50, 10000))
-    
-    # Create DataFrame
-    df = pd.DataFrame(data)
-    
-    # Add duplicates (5% of records)
+    # Generate every column as a whole array instead of row by row;
+    # string columns are drawn as integer codes into a category table
+    hours, base_dt, rush = build_calendar(start_date, num_records)
+    
+    # Draw every per-record roulette in one batch, one row per check below
+    (issue_roll, id_roll, rand_choice, city_roll, area_roll, vehicle_outlier_roll,
+     vehicle_null_roll, speed_outlier_roll, speed_null_roll, accident_outlier_roll,
+     accident_null_roll, congestion_null_roll, congestion_wrong_roll, road_roll,
+     visibility_outlier_roll, visibility_null_roll) = np.random.random((16, num_records))
+    
+    # Decide which records will have issues
+    has_issues = issue_roll < 0.3  # 30% of records have issues
+    
+    # ----- traffic_id -----
+    # Generate ID (9001, 9002, ...)
+    traffic_id = (9000 + hours + 1).astype(float)
+    null_id = has_issues & (id_roll < 0.1)  # 10% of problematic records
+    traffic_id[null_id] = np.nan  # NULL ID
+    
+    # ----- date_time -----
+    minutes = np.random.randint(0, 60, num_records)
+    dt = base_dt + pd.to_timedelta(minutes, 'm')
+    # Canonical '%Y-%m-%d %H:%M' is NumPy's minute-resolution ISO string with a space for the 'T'
+    date_time = np.char.replace(np.datetime_as_string(dt.values, unit='m'), 'T', ' ').astype(object)
+    
+    # Introduce date format issues
+    null_date = has_issues & (rand_choice < 0.05)  # 5%: NULL timestamp
+    invalid_date = has_issues & (rand_choice >= 0.05) & (rand_choice < 0.1)  # 5%: Invalid format
+    other_format = has_issues & (rand_choice >= 0.1) & (rand_choice < 0.2)  # 10%: Different format
+    
+    invalid_formats = ['TBD', '2099-00-00 99:99', 'Unknown', 'N/A']
+    date_time[invalid_date] = np.random.choice(invalid_formats, invalid_date.sum())
+    
+    formats = [
+        '%d/%m/%Y %I:%M%p',  # 15/01/2024 8AM
+        '%Y-%m-%dT%H:%MZ',   # 2024-01-15T08:00Z
+        '%d-%b-%Y %H:%M'     # 15-Jan-2024 08:00
+    ]
+    format_choice = np.random.randint(0, len(formats), num_records)
+    for k, fmt in enumerate(formats):
+        mask = other_format & (format_choice == k)
+        date_time[mask] = dt[mask].strftime(fmt)
+    date_time[null_date] = None
+    
+    # ----- city -----
+    city = np.full(num_records, 'London', dtype=object)
+    city[has_issues & (city_roll < 0.05)] = None  # 5% NULL city
+    
+    # ----- area -----
+    area_table = np.array(london_areas, dtype=object)
+    area = area_table[np.random.randint(0, len(area_table), num_records)]
+    area[has_issues & (area_roll < 0.1)] = None  # 10% NULL area
+    
+    # ----- vehicle_count -----
+    # More vehicles during rush hours (7-9 AM, 5-7 PM)
+    base_vehicles = np.where(rush,
+                             np.random.randint(1000, 5001, num_records),
+                             np.random.randint(100, 2001, num_records))
+    
+    outlier = has_issues & (vehicle_outlier_roll < 0.05)  # 5% extreme outliers
+    null = has_issues & ~outlier & (vehicle_null_roll < 0.1)  # 10% NULL
+    vehicle_count = np.where(outlier, np.random.randint(20000, 50001, num_records), base_vehicles).astype(float)
+    vehicle_count[null] = np.nan
+    
+    # ----- avg_speed_kmh -----
+    # Lower speed during high traffic
+    base_speed = np.where(base_vehicles > 3000,
+                          np.random.uniform(10, 40, num_records),
+                          np.random.uniform(40, 120, num_records))
+    
+    outlier = has_issues & (speed_outlier_roll < 0.05)  # 5% negative speeds
+    null = has_issues & ~outlier & (speed_null_roll < 0.1)  # 10% NULL
+    avg_speed_kmh = np.where(outlier, np.random.uniform(-50, -1, num_records), np.round(base_speed, 1))
+    avg_speed_kmh[null] = np.nan
+    
+    # ----- accident_count -----
+    # More accidents during bad weather (simulated by random here)
+    # Higher probability during rush hours; each group gets only the draws it needs
+    base_accidents = np.empty(num_records, dtype=int)
+    base_accidents[rush] = np.random.choice([0, 1, 2, 3, 4, 5], rush.sum(),
+                                            p=[0.8, 0.1, 0.05, 0.03, 0.01, 0.01])
+    base_accidents[~rush] = np.random.choice([0, 1, 2, 3], (~rush).sum(),
+                                             p=[0.95, 0.03, 0.015, 0.005])
+    
+    outlier = has_issues & (accident_outlier_roll < 0.02)  # 2% extreme values
+    null = has_issues & ~outlier & (accident_null_roll < 0.1)  # 10% NULL
+    accident_count = np.where(outlier, np.random.randint(50, 101, num_records), base_accidents).astype(float)
+    accident_count[null] = np.nan
+    
+    # ----- congestion_level -----
+    # Base on vehicle count and speed
+    congestion_table = np.array(congestion_levels, dtype=object)
+    congestion_level = congestion_table[np.select(
+        [(base_vehicles > 4000) & (base_speed < 30), (base_vehicles > 2000) & (base_speed < 50)],
+        [2, 1],
+        default=0
+    )]
+    
+    null = has_issues & (congestion_null_roll < 0.1)  # 10% NULL
+    wrong = has_issues & ~null & (congestion_wrong_roll < 0.05)  # 5% incorrect categories
+    wrong_categories = ['Very High', 'Low-Medium', 'Heavy', 'Light', 'Severe']
+    congestion_level[wrong] = np.random.choice(wrong_categories, wrong.sum())
+    congestion_level[null] = None
+    
+    # ----- road_condition -----
+    road_table = np.array(road_conditions, dtype=object)
+    road_condition = road_table[np.random.randint(0, len(road_table), num_records)]
+    road_condition[has_issues & (road_roll < 0.1)] = None  # 10% NULL
+    
+    # ----- visibility_m -----
+    outlier = has_issues & (visibility_outlier_roll < 0.05)  # 5% extreme values
+    null = has_issues & ~outlier & (visibility_null_roll < 0.1)  # 10% NULL
+    visibility_m = np.where(outlier,
+                            np.random.choice([10, 100000], num_records),
+                            np.random.randint(50, 10001, num_records)).astype(float)
+    visibility_m[null] = np.nan
+    
+    data = {
+        'traffic_id': traffic_id,
+        'date_time': date_time,
+        'city': city,
+        'area': area,
+        'vehicle_count': vehicle_count,
+        'avg_speed_kmh': avg_speed_kmh,
+        'accident_count': accident_count,
+        'congestion_level': congestion_level,
+        'road_condition': road_condition,
+        'visibility_m': visibility_m
+    }
+    
+    # Add duplicates (5% of records) as extra row indices into the column arrays
     num_duplicates = int(num_records * 0.05)
-    duplicate_indices = random.sample(range(num_records), num_duplicates)
-    duplicates = df.iloc[duplicate_indices].copy()
+    duplicate_indices = np.random.choice(num_records, num_duplicates, replace=False)
     
-    # Modify some duplicates slightly
-    for idx in range(len(duplicates)):
-        if random.random() < 0.5:
-            # Change the ID to create exact duplicate IDs
-            duplicates.iloc[idx, 0] = random.choice(data['traffic_id'][:100])
+    # Shuffle originals and duplicates with one shared permutation, then gather each column once
+    perm = np.random.default_rng(42).permutation(num_records + num_duplicates)
+    rows = np.concatenate([np.arange(num_records), duplicate_indices])[perm]
+    columns = {col: values[rows] for col, values in data.items()}
     
-    df = pd.concat([df, duplicates], ignore_index=True)
+    # Modify some duplicates slightly
+    # Change the ID of about half of them to create exact duplicate IDs
+    swap_mask = (perm >= num_records) & (np.random.random(len(perm)) < 0.5)
+    columns['traffic_id'][swap_mask] = np.random.choice(traffic_id[:100], swap_mask.sum())
     
-    # Shuffle the DataFrame
-    df = df.sample(frac=1, random_state=42).reset_index(drop=True)
+    # Create DataFrame (nullable dtypes keep integer columns integer alongside NULLs)
+    df = pd.DataFrame(columns).astype({'traffic_id': 'Int64', 'vehicle_count': 'Int64',
+                                       'avg_speed_kmh': 'Float64', 'accident_count': 'Int64',
+                                       'visibility_m': 'Int64'})
     
     return df
 
 def save_traffic_data(df, filename='synthetic_traffic_data.csv'):
     """Save the generated traffic data to CSV"""
-    df.to_csv(filename, index=False)
+    # PyArrow's CSV writer formats whole columns in C++; no generated value needs quoting
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pacsv.write_csv(table, filename, write_options=pacsv.WriteOptions(quoting_style='none'))
     print(f"Traffic data saved to {filename}")
     print(f"Total records: {len(df)}")
     print(f"Records with negative speed: {len(df[df['avg_speed_kmh'] < 0])}")
@@ -1,37 +1,40 @@
 # weather_data_generator.py
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from datetime import datetime
+from functools import lru_cache
 import uuid
 
+# Season definitions
+seasons = {
+    1: 'Winter', 2: 'Winter', 3: 'Spring', 4: 'Spring', 5: 'Spring',
+    6: 'Summer', 7: 'Summer', 8: 'Summer', 9: 'Autumn', 10: 'Autumn',
+    11: 'Autumn', 12: 'Winter'
+}
+
+@lru_cache(maxsize=8)
+def build_calendar(start_date, num_records):
+    """
+    Build the hourly structure that does not depend on the RNG: timestamps,
+    their canonical strings and the season of each hour. Cached per shape so
+    repeated runs only redraw the random parts; the arrays are read-only.
+    """
+    dt = pd.Timestamp(start_date) + pd.to_timedelta(np.arange(num_records), 'h')
+    # Canonical '%Y-%m-%d %H:%M' is NumPy's minute-resolution ISO string with a space for the 'T'
+    canonical = np.char.replace(np.datetime_as_string(dt.values, unit='m'), 'T', ' ').astype(object)
+    season_by_month = np.array([None] + [seasons[m] for m in range(1, 13)], dtype=object)
+    season_arr = season_by_month[dt.month]
+    for arr in (canonical, season_arr):
+        arr.flags.writeable = False
+    return dt, canonical, season_arr
+
 def generate_weather_data(num_records=5000):
     """
     Generate synthetic weather data with messy scenarios
     """
     
-    # Base data structures
-    data = {
-        'weather_id': [],
-        'date_time': [],
-        'city': [],
-        'season': [],
-        'temperature_c': [],
-        'humidity': [],
-        'rain_mm': [],
-        'wind_speed_kmh': [],
-        'visibility_m': [],
-        'weather_condition': [],
-        'air_pressure_hpa': []
-    }
-    
-    # Season definitions
-    seasons = {
-        1: 'Winter', 2: 'Winter', 3: 'Spring', 4: 'Spring', 5: 'Spring',
-        6: 'Summer', 7: 'Summer', 8: 'Summer', 9: 'Autumn', 10: 'Autumn',
-        11: 'Autumn', 12: 'Winter'
-    }
-    
     # Weather conditions with probabilities
     weather_conditions = ['Clear', 'Rain', 'Fog', 'Storm', 'Snow']
     weather_probs = [0.5, 0.25, 0.1, 0.1, 0.05]
@@ -39,165 +42,170 @@ def generate_weather_data(num_records=5000):
     # Start date
     start_date = datetime(2024, 1, 1, 0, 0)
     
-    # Generate base records
-    for i in range(num_records):
-        # Generate ID (5001, 5002, ...)
-        base_id = 5000 + i + 1
-        
-        # Decide if this record will have issues
-        has_issues = random.random() < 0.3  # 30% of records have issues
-        
-        # ----- weather_id -----
-        if has_issues and random.random() < 0.1:  # 10% of problematic records
-            data['weather_id'].append(None)  # NULL ID
-        else:
-            data['weather_id'].append(base_id)
-        
-        # ----- date_time -----
-        current_date = start_date + timedelta(hours=i)
-        
-        if has_issues:
-            # Introduce date format issues
-            rand_choice = random.random()
-            if rand_choice < 0.05:  # 5%: NULL timestamp
-                data['date_time'].append(None)
-            elif rand_choice < 0.1:  # 5%: Invalid format
-                invalid_formats = ['2099-13-40 25:61', 'Unknown', 'Invalid Date']
-                data['date_time'].append(random.choice(invalid_formats))
-            elif rand_choice < 0.2:  # 10%: Different format
-                formats = [
-                    current_date.strftime('%d/%m/%Y %I:%M%p'),  # 15/01/2024 2PM
-                    current_date.strftime('%Y-%m-%dT%H:%MZ'),   # 2024-01-15T14:00Z
-                    current_date.strftime('%Y/%m/%d %H:%M:%S')   # 2024/01/15 14:00:00
-                ]
-                data['date_time'].append(random.choice(formats))
-            else:  # Standard format
-                data['date_time'].append(current_date.strftime('%Y-%m-%d %H:%M'))
-        else:
-            data['date_time'].append(current_date.strftime('%Y-%m-%d %H:%M'))
-        
-        # ----- city -----
-        if has_issues and random.random() < 0.05:  # 5% NULL city
-            data['city'].append(None)
-        else:
-            data['city'].append('London')
-        
-        # ----- season -----
-        month = current_date.month
-        if has_issues and random.random() < 0.1:  # 10% NULL or wrong season
-            if random.random() < 0.5:
-                data['season'].append(None)
-            else:
-                wrong_seasons = ['Monsoon', 'Fall', 'Rainy', 'Dry']
-                data['season'].append(random.choice(wrong_seasons))
-        else:
-            data['season'].append(seasons[month])
-        
-        # ----- temperature_c -----
-        season = seasons[month]
-        if season == 'Winter':
-            base_temp = random.uniform(-5, 15)
-        elif season == 'Summer':
-            base_temp = random.uniform(10, 35)
-        elif season == 'Spring':
-            base_temp = random.uniform(5, 25)
-        else:  # Autumn
-            base_temp = random.uniform(5, 20)
-        
-        if has_issues and random.random() < 0.05:  # 5% outliers
-            data['temperature_c'].append(random.choice([-30, 60, 100]))
-        elif has_issues and random.random() < 0.1:  # 10% NULL
-            data['temperature_c'].append(None)
-        else:
-            data['temperature_c'].append(round(base_temp, 1))
-        
-        # ----- humidity -----
-        if has_issues and random.random() < 0.05:  # 5% outliers
-            data['humidity'].append(random.choice([-10, 150, 200]))
-        elif has_issues and random.random() < 0.1:  # 10% NULL
-            data['humidity'].append(None)
-        else:
-            # Higher humidity in winter, lower in summer
-            if season in ['Winter', 'Autumn']:
-                data['humidity'].append(random.randint(60, 100))
-            else:
-                data['humidity'].append(random.randint(20, 80))
-        
-        # ----- rain_mm -----
-        if has_issues and random.random() < 0.05:  # 5% extreme values
-            data['rain_mm'].append(random.uniform(120, 300))
-        elif has_issues and random.random() < 0.1:  # 10% NULL
-            data['rain_mm'].append(None)
-        else:
-            # More rain in winter and autumn
-            if season in ['Winter', 'Autumn']:
-                data['rain_mm'].append(round(random.uniform(0, 30), 1))
-            else:
-                data['rain_mm'].append(round(random.uniform(0, 10), 1))
-        
-        # ----- wind_speed_kmh -----
-        if has_issues and random.random() < 0.05:  # 5% outliers
-            data['wind_speed_kmh'].append(random.uniform(200, 500))
-        elif has_issues and random.random() < 0.1:  # 10% NULL
-            data['wind_speed_kmh'].append(None)
-        else:
-            data['wind_speed_kmh'].append(round(random.uniform(0, 80), 1))
-        
-        # ----- visibility_m -----
-        if has_issues and random.random() < 0.05:  # 5% extreme values
-            data['visibility_m'].append(50000)
-        elif has_issues and random.random() < 0.05:  # 5% non-numeric strings
-            non_numeric = ['Low', 'Very Low', 'High', 'Unknown']
-            data['visibility_m'].append(random.choice(non_numeric))
-        elif has_issues and random.random() < 0.1:  # 10% NULL
-            data['visibility_m'].append(None)
-        else:
-            data['visibility_m'].append(random.randint(50, 10000))
-        
-        # ----- weather_condition -----
-        if has_issues and random.random() < 0.1:  # 10% NULL
-            data['weather_condition'].append(None)
-        else:
-            # Adjust probabilities based on season
-            if season == 'Winter':
-                adj_probs = [0.4, 0.2, 0.1, 0.1, 0.2]  # More snow
-            elif season == 'Summer':
-                adj_probs = [0.7, 0.1, 0.05, 0.1, 0.05]  # More clear
-            else:
-                adj_probs = weather_probs
-            
-            data['weather_condition'].append(np.random.choice(weather_conditions, p=adj_probs))
-        
-        # ----- air_pressure_hpa -----
-        if has_issues and random.random() < 0.1:  # 10% NULL
-            data['air_pressure_hpa'].append(None)
-        else:
-            data['air_pressure_hpa'].append(round(random.uniform(950, 1050), 1))
-    
-    # Create DataFrame
-    df = pd.DataFrame(data)
-    
-    # Add duplicates (5% of records)
+    # Generate every column as a whole array instead of row by row;
+    # string columns are drawn as integer codes into a category table
+    hours = np.arange(num_records)
+    dt, canonical, season_arr = build_calendar(start_date, num_records)
+    
+    # Draw every per-record roulette in one batch, one row per check below
+    (issue_roll, id_roll, rand_choice, city_roll, season_roll, season_null_roll,
+     temp_outlier_roll, temp_null_roll, humidity_outlier_roll, humidity_null_roll,
+     rain_outlier_roll, rain_null_roll, wind_outlier_roll, wind_null_roll,
+     visibility_outlier_roll, visibility_non_numeric_roll, visibility_null_roll,
+     condition_null_roll, pressure_null_roll) = np.random.random((19, num_records))
+    
+    # Decide which records will have issues
+    has_issues = issue_roll < 0.3  # 30% of records have issues
+    
+    # ----- weather_id -----
+    # Generate ID (5001, 5002, ...)
+    weather_id = (5000 + hours + 1).astype(float)
+    null_id = has_issues & (id_roll < 0.1)  # 10% of problematic records
+    weather_id[null_id] = np.nan  # NULL ID
+    
+    # ----- date_time -----
+    date_time = canonical.copy()
+    
+    # Introduce date format issues
+    null_date = has_issues & (rand_choice < 0.05)  # 5%: NULL timestamp
+    invalid_date = has_issues & (rand_choice >= 0.05) & (rand_choice < 0.1)  # 5%: Invalid format
+    other_format = has_issues & (rand_choice >= 0.1) & (rand_choice < 0.2)  # 10%: Different format
+    
+    invalid_formats = ['2099-13-40 25:61', 'Unknown', 'Invalid Date']
+    date_time[invalid_date] = np.random.choice(invalid_formats, invalid_date.sum())
+    
+    formats = [
+        '%d/%m/%Y %I:%M%p',  # 15/01/2024 2PM
+        '%Y-%m-%dT%H:%MZ',   # 2024-01-15T14:00Z
+        '%Y/%m/%d %H:%M:%S'  # 2024/01/15 14:00:00
+    ]
+    format_choice = np.random.randint(0, len(formats), num_records)
+    for k, fmt in enumerate(formats):
+        mask = other_format & (format_choice == k)
+        date_time[mask] = dt[mask].strftime(fmt)
+    date_time[null_date] = None
+    
+    # ----- city -----
+    city = np.full(num_records, 'London', dtype=object)
+    city[has_issues & (city_roll < 0.05)] = None  # 5% NULL city
+    
+    # ----- season -----
+    winter = season_arr == 'Winter'
+    summer = season_arr == 'Summer'
+    spring = season_arr == 'Spring'
+    wet_season = winter | (season_arr == 'Autumn')
+    
+    season = season_arr.copy()
+    bad_season = has_issues & (season_roll < 0.1)  # 10% NULL or wrong season
+    wrong_seasons = ['Monsoon', 'Fall', 'Rainy', 'Dry']
+    season[bad_season] = np.random.choice(wrong_seasons, bad_season.sum())
+    season[bad_season & (season_null_roll < 0.5)] = None
+    
+    # ----- temperature_c -----
+    temp_low = np.select([winter, summer, spring], [-5, 10, 5], default=5)
+    temp_high = np.select([winter, summer, spring], [15, 35, 25], default=20)  # Autumn: 5 to 20
+    base_temp = np.random.uniform(temp_low, temp_high)
+    
+    outlier = has_issues & (temp_outlier_roll < 0.05)  # 5% outliers
+    null = has_issues & ~outlier & (temp_null_roll < 0.1)  # 10% NULL
+    temperature_c = np.where(outlier, np.random.choice([-30, 60, 100], num_records), np.round(base_temp, 1))
+    temperature_c[null] = np.nan
+    
+    # ----- humidity -----
+    # Higher humidity in winter, lower in summer
+    base_humidity = np.where(wet_season,
+                             np.random.randint(60, 101, num_records),
+                             np.random.randint(20, 81, num_records))
+    
+    outlier = has_issues & (humidity_outlier_roll < 0.05)  # 5% outliers
+    null = has_issues & ~outlier & (humidity_null_roll < 0.1)  # 10% NULL
+    humidity = np.where(outlier, np.random.choice([-10, 150, 200], num_records), base_humidity).astype(float)
+    humidity[null] = np.nan
+    
+    # ----- rain_mm -----
+    # More rain in winter and autumn
+    base_rain = np.round(np.random.uniform(0, np.where(wet_season, 30, 10)), 1)
+    
+    outlier = has_issues & (rain_outlier_roll < 0.05)  # 5% extreme values
+    null = has_issues & ~outlier & (rain_null_roll < 0.1)  # 10% NULL
+    rain_mm = np.where(outlier, np.random.uniform(120, 300, num_records), base_rain)
+    rain_mm[null] = np.nan
+    
+    # ----- wind_speed_kmh -----
+    outlier = has_issues & (wind_outlier_roll < 0.05)  # 5% outliers
+    null = has_issues & ~outlier & (wind_null_roll < 0.1)  # 10% NULL
+    wind_speed_kmh = np.where(outlier,
+                              np.random.uniform(200, 500, num_records),
+                              np.round(np.random.uniform(0, 80, num_records), 1))
+    wind_speed_kmh[null] = np.nan
+    
+    # ----- visibility_m -----
+    outlier = has_issues & (visibility_outlier_roll < 0.05)  # 5% extreme values
+    non_numeric = has_issues & ~outlier & (visibility_non_numeric_roll < 0.05)  # 5% non-numeric strings
+    null = has_issues & ~outlier & ~non_numeric & (visibility_null_roll < 0.1)  # 10% NULL
+    visibility_m = np.random.randint(50, 10001, num_records).astype(object)
+    visibility_m[outlier] = 50000
+    visibility_m[non_numeric] = np.random.choice(['Low', 'Very Low', 'High', 'Unknown'], non_numeric.sum())
+    visibility_m[null] = None
+    
+    # ----- weather_condition -----
+    # Adjust probabilities based on season, with one batched draw per season group
+    season_probs = [
+        (winter, [0.4, 0.2, 0.1, 0.1, 0.2]),  # More snow
+        (summer, [0.7, 0.1, 0.05, 0.1, 0.05]),  # More clear
+        (~winter & ~summer, weather_probs)
+    ]
+    condition_idx = np.empty(num_records, dtype=np.intp)
+    for group, probs in season_probs:
+        condition_idx[group] = np.random.choice(len(weather_conditions), group.sum(), p=probs)
+    weather_condition = np.array(weather_conditions, dtype=object)[condition_idx]
+    weather_condition[has_issues & (condition_null_roll < 0.1)] = None  # 10% NULL
+    
+    # ----- air_pressure_hpa -----
+    air_pressure_hpa = np.round(np.random.uniform(950, 1050, num_records), 1)
+    air_pressure_hpa[has_issues & (pressure_null_roll < 0.1)] = np.nan  # 10% NULL
+    
+    data = {
+        'weather_id': weather_id,
+        'date_time': date_time,
+        'city': city,
+        'season': season,
+        'temperature_c': temperature_c,
+        'humidity': humidity,
+        'rain_mm': rain_mm,
+        'wind_speed_kmh': wind_speed_kmh,
+        'visibility_m': visibility_m,
+        'weather_condition': weather_condition,
+        'air_pressure_hpa': air_pressure_hpa
+    }
+    
+    # Add duplicates (5% of records) as extra row indices into the column arrays
     num_duplicates = int(num_records * 0.05)
-    duplicate_indices = random.sample(range(num_records), num_duplicates)
-    duplicates = df.iloc[duplicate_indices].copy()
+    duplicate_indices = np.random.choice(num_records, num_duplicates, replace=False)
     
-    # Modify some duplicates slightly
-    for idx in range(len(duplicates)):
-        if random.random() < 0.5:
-            # Change the ID to create exact duplicate IDs
-            duplicates.iloc[idx, 0] = random.choice(data['weather_id'][:100])
+    # Shuffle originals and duplicates with one shared permutation, then gather each column once
+    perm = np.random.default_rng(42).permutation(num_records + num_duplicates)
+    rows = np.concatenate([np.arange(num_records), duplicate_indices])[perm]
+    columns = {col: values[rows] for col, values in data.items()}
     
-    df = pd.concat([df, duplicates], ignore_index=True)
+    # Modify some duplicates slightly
+    # Change the ID of about half of them to create exact duplicate IDs
+    swap_mask = (perm >= num_records) & (np.random.random(len(perm)) < 0.5)
+    columns['weather_id'][swap_mask] = np.random.choice(weather_id[:100], swap_mask.sum())
     
-    # Shuffle the DataFrame
-    df = df.sample(frac=1, random_state=42).reset_index(drop=True)
+    # Create DataFrame (nullable dtypes keep integer columns integer alongside NULLs)
+    df = pd.DataFrame(columns).astype({'weather_id': 'Int64', 'temperature_c': 'Float64',
+                                       'humidity': 'Int64', 'rain_mm': 'Float64',
+                                       'wind_speed_kmh': 'Float64', 'air_pressure_hpa': 'Float64'})
     
     return df
 
 def save_weather_data(df, filename='synthetic_weather_data.csv'):
     """Save the generated weather data to CSV"""
-    df.to_csv(filename, index=False)
+    # PyArrow's CSV writer formats whole columns in C++; no generated value needs quoting.
+    # visibility_m mixes numbers and strings, so hand it to Arrow as a string column.
+    table = pa.Table.from_pandas(df.astype({'visibility_m': 'string'}), preserve_index=False)
+    pacsv.write_csv(table, filename, write_options=pacsv.WriteOptions(quoting_style='none'))
     print(f"Weather data saved to {filename}")
     print(f"Total records: {len(df)}")
     print(f"Records with NULL weather_id: {df['weather_id'].isna().sum()}")
@@ -2,9 +2,57 @@
 # phase2_clean.py - Data cleaning from Bronze to Silver
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 from minio import Minio
 import io
-import os
+
+# Canonical timestamp format written by the generators, followed by the alternates they inject
+DATE_FORMATS = ['%Y-%m-%d %H:%M', '%d/%m/%Y %I:%M%p', '%Y-%m-%dT%H:%MZ',
+                '%Y/%m/%d %H:%M:%S', '%d-%b-%Y %H:%M']
+
+# Column dtypes of the raw Bronze CSVs, so read_csv skips type inference
+WEATHER_DTYPES = {
+    'weather_id': 'Int64', 'date_time': 'string', 'city': 'string',
+    'season': 'category', 'temperature_c': 'float64', 'humidity': 'float64',
+    'rain_mm': 'float64', 'wind_speed_kmh': 'float64', 'visibility_m': 'string',
+    'weather_condition': 'category', 'air_pressure_hpa': 'float64'
+}
+TRAFFIC_DTYPES = {
+    'traffic_id': 'Int64', 'date_time': 'string', 'city': 'string', 'area': 'category',
+    'vehicle_count': 'float64', 'avg_speed_kmh': 'float64', 'accident_count': 'float64',
+    'congestion_level': 'category', 'road_condition': 'category', 'visibility_m': 'float64'
+}
+
+def parse_datetimes(values):
+    """Parse timestamp strings, converting each distinct string only once"""
+    codes, uniques = pd.factorize(values)
+    
+    # Strict parse with the canonical format, then retry only the leftovers with each alternate
+    parsed = pd.to_datetime(uniques, format=DATE_FORMATS[0], errors='coerce').to_numpy(dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS[1:]:
+        missing = np.isnat(parsed)
+        if not missing.any():
+            break
+        retry = pd.to_datetime(uniques[missing], format=fmt, errors='coerce')
+        parsed[missing] = retry.to_numpy(dtype='datetime64[ns]')
+    
+    parsed = pd.DatetimeIndex(parsed)
+    return pd.Series(parsed.take(codes, allow_fill=True, fill_value=pd.NaT), index=values.index)
+
+def clip_numeric(values, lower, upper):
+    """Coerce a column to float and clip it to [lower, upper] in a single buffer"""
+    array = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, copy=True)
+    np.clip(array, lower, upper, out=array)
+    return array
+
+def to_parquet_buffer(df):
+    """Serialize a DataFrame to an in-memory Parquet file ready for upload"""
+    buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buffer,
+                   compression='snappy', use_dictionary=True)
+    buffer.seek(0)
+    return buffer
 
 def main():
     print("PHASE 2: DATA CLEANING")
@@ -18,134 +66,124 @@ def main():
         secure=False
     )
     
-    # Create directories
-    os.makedirs('cleaned_data', exist_ok=True)
-    
     # ===== 1. WEATHER DATA CLEANING =====
     print("\n1. Processing weather data...")
     
     # Download from Bronze
     weather_response = client.get_object("bronze", "weather_data_raw.csv")
-    weather_df = pd.read_csv(io.BytesIO(weather_response.read()))
+    # Parse straight from the HTTP response with explicit dtypes: numeric columns are
+    # converted inline, low-cardinality strings become categoricals, and visibility_m
+    # stays text because it carries labels like 'Low' that are coerced below
+    weather_df = pd.read_csv(weather_response, dtype=WEATHER_DTYPES)
+    weather_response.close()
+    weather_response.release_conn()
     print(f"   Downloaded: {len(weather_df)} records")
     
     # Remove duplicates
     weather_df = weather_df.drop_duplicates()
     
     # Fix date_time column
-    weather_df['date_time'] = pd.to_datetime(weather_df['date_time'], errors='coerce')
+    weather_df['date_time'] = parse_datetimes(weather_df['date_time'])
     
     # Fix temperature (London range: -10 to 40°C)
-    weather_df['temperature_c'] = pd.to_numeric(weather_df['temperature_c'], errors='coerce')
-    weather_df['temperature_c'] = weather_df['temperature_c'].clip(-10, 40)
+    weather_df['temperature_c'] = clip_numeric(weather_df['temperature_c'], -10, 40)
     
     # Fix humidity (0-100%)
-    weather_df['humidity'] = pd.to_numeric(weather_df['humidity'], errors='coerce')
-    weather_df['humidity'] = weather_df['humidity'].clip(0, 100)
+    weather_df['humidity'] = clip_numeric(weather_df['humidity'], 0, 100)
     
     # Fix rainfall (0-100mm)
-    weather_df['rain_mm'] = pd.to_numeric(weather_df['rain_mm'], errors='coerce')
-    weather_df['rain_mm'] = weather_df['rain_mm'].clip(0, 100)
+    weather_df['rain_mm'] = clip_numeric(weather_df['rain_mm'], 0, 100)
     
     # Fix wind speed (0-150 km/h)
-    weather_df['wind_speed_kmh'] = pd.to_numeric(weather_df['wind_speed_kmh'], errors='coerce')
-    weather_df['wind_speed_kmh'] = weather_df['wind_speed_kmh'].clip(0, 150)
+    weather_df['wind_speed_kmh'] = clip_numeric(weather_df['wind_speed_kmh'], 0, 150)
     
     # Fix visibility - convert to numeric first
-    weather_df['visibility_m'] = pd.to_numeric(weather_df['visibility_m'], errors='coerce')
-    weather_df['visibility_m'] = weather_df['visibility_m'].clip(50, 20000)
+    weather_df['visibility_m'] = clip_numeric(weather_df['visibility_m'], 50, 20000)
     
     # Fix air pressure (950-1050 hPa)
-    weather_df['air_pressure_hpa'] = pd.to_numeric(weather_df['air_pressure_hpa'], errors='coerce')
-    weather_df['air_pressure_hpa'] = weather_df['air_pressure_hpa'].clip(950, 1050)
+    weather_df['air_pressure_hpa'] = clip_numeric(weather_df['air_pressure_hpa'], 950, 1050)
     
     # Fix weather conditions
     valid_conditions = ['Clear', 'Rain', 'Fog', 'Storm', 'Snow']
-    weather_df['weather_condition'] = weather_df['weather_condition'].apply(
-        lambda x: x if x in valid_conditions else np.random.choice(valid_conditions)
-    )
+    weather_df['weather_condition'] = weather_df['weather_condition'].cat.set_categories(valid_conditions)
+    invalid = weather_df['weather_condition'].isna()
+    weather_df.loc[invalid, 'weather_condition'] = np.random.choice(valid_conditions, invalid.sum())
     
     # Set all cities to London
     weather_df['city'] = 'London'
     
     # Fill missing seasons based on date
-    def get_season(date):
-        if pd.isna(date):
-            return None
-        month = date.month
-        if month in [12, 1, 2]:
-            return 'Winter'
-        elif month in [3, 4, 5]:
-            return 'Spring'
-        elif month in [6, 7, 8]:
-            return 'Summer'
-        else:
-            return 'Autumn'
-    
-    weather_df['season'] = weather_df.apply(
-        lambda row: row['season'] if pd.notna(row['season']) and row['season'] in ['Winter', 'Spring', 'Summer', 'Autumn'] 
-        else get_season(row['date_time']), axis=1
+    valid_seasons = ['Winter', 'Spring', 'Summer', 'Autumn']
+    month = weather_df['date_time'].dt.month
+    season_from_date = np.select(
+        [month.isin([12, 1, 2]), month.isin([3, 4, 5]), month.isin([6, 7, 8]), month.isin([9, 10, 11])],
+        valid_seasons,
+        default=None
     )
+    weather_df['season'] = weather_df['season'].cat.set_categories(valid_seasons)
+    weather_df['season'] = weather_df['season'].fillna(pd.Series(season_from_date, index=weather_df.index))
     
     # Remove rows with missing critical data
     weather_df = weather_df.dropna(subset=['date_time', 'temperature_c'])
     
     print(f"   Cleaned: {len(weather_df)} records")
     
-    # Save as Parquet
-    weather_file = 'cleaned_data/weather_cleaned.parquet'
-    weather_df.to_parquet(weather_file, index=False)
-    print(f"   Saved: {weather_file}")
+    # Categoricals become Parquet dictionary columns; city is the only one still stored as strings
+    weather_df['city'] = weather_df['city'].astype('category')
+    
+    # Serialize as Parquet in memory
+    weather_buffer = to_parquet_buffer(weather_df)
+    print(f"   Serialized: weather_cleaned.parquet ({weather_buffer.getbuffer().nbytes:,} bytes)")
     
     # ===== 2. TRAFFIC DATA CLEANING =====
     print("\n2. Processing traffic data...")
     
     # Download from Bronze
     traffic_response = client.get_object("bronze", "traffic_data_raw.csv")
-    traffic_df = pd.read_csv(io.BytesIO(traffic_response.read()))
+    # Parse straight from the HTTP response with explicit dtypes: numeric columns are
+    # converted inline and low-cardinality strings become categoricals
+    traffic_df = pd.read_csv(traffic_response, dtype=TRAFFIC_DTYPES)
+    traffic_response.close()
+    traffic_response.release_conn()
     print(f"   Downloaded: {len(traffic_df)} records")
     
     # Remove duplicates
     traffic_df = traffic_df.drop_duplicates()
     
     # Fix date_time column
-    traffic_df['date_time'] = pd.to_datetime(traffic_df['date_time'], errors='coerce')
+    traffic_df['date_time'] = parse_datetimes(traffic_df['date_time'])
     
     # Fix area/district names
     valid_areas = ['Camden', 'Chelsea', 'Islington', 'Southwark', 'Kensington',
                    'Westminster', 'Greenwich', 'Hackney', 'Lambeth']
     
-    traffic_df['area'] = traffic_df['area'].apply(
-        lambda x: x if x in valid_areas else np.random.choice(valid_areas)
-    )
+    traffic_df['area'] = traffic_df['area'].cat.set_categories(valid_areas)
+    invalid = traffic_df['area'].isna()
+    traffic_df.loc[invalid, 'area'] = np.random.choice(valid_areas, invalid.sum())
     
     # Fix vehicle count (0-10,000)
-    traffic_df['vehicle_count'] = pd.to_numeric(traffic_df['vehicle_count'], errors='coerce')
-    traffic_df['vehicle_count'] = traffic_df['vehicle_count'].clip(0, 10000)
+    traffic_df['vehicle_count'] = clip_numeric(traffic_df['vehicle_count'], 0, 10000)
     
     # Fix average speed (0-120 km/h)
-    traffic_df['avg_speed_kmh'] = pd.to_numeric(traffic_df['avg_speed_kmh'], errors='coerce')
-    traffic_df['avg_speed_kmh'] = traffic_df['avg_speed_kmh'].clip(0, 120)
+    traffic_df['avg_speed_kmh'] = clip_numeric(traffic_df['avg_speed_kmh'], 0, 120)
     
     # Fix accident count (0-20)
-    traffic_df['accident_count'] = pd.to_numeric(traffic_df['accident_count'], errors='coerce')
-    traffic_df['accident_count'] = traffic_df['accident_count'].clip(0, 20)
+    traffic_df['accident_count'] = clip_numeric(traffic_df['accident_count'], 0, 20)
     
     # Fix congestion level
     valid_congestion = ['Low', 'Medium', 'High']
-    traffic_df['congestion_level'] = traffic_df['congestion_level'].apply(
-        lambda x: x if x in valid_congestion else np.random.choice(valid_congestion)
-    )
+    traffic_df['congestion_level'] = traffic_df['congestion_level'].cat.set_categories(valid_congestion)
+    invalid = traffic_df['congestion_level'].isna()
+    traffic_df.loc[invalid, 'congestion_level'] = np.random.choice(valid_congestion, invalid.sum())
     
     # Fix road condition
     valid_road = ['Dry', 'Wet', 'Snowy', 'Damaged']
-    traffic_df['road_condition'] = traffic_df['road_condition'].apply(
-        lambda x: x if x in valid_road else np.random.choice(valid_road)
-    )
+    traffic_df['road_condition'] = traffic_df['road_condition'].cat.set_categories(valid_road)
+    invalid = traffic_df['road_condition'].isna()
+    traffic_df.loc[invalid, 'road_condition'] = np.random.choice(valid_road, invalid.sum())
     
     # Fix visibility - convert to numeric first
-    traffic_df['visibility_m'] = pd.to_numeric(traffic_df['visibility_m'], errors='coerce')
-    traffic_df['visibility_m'] = traffic_df['visibility_m'].clip(50, 10000)
+    traffic_df['visibility_m'] = clip_numeric(traffic_df['visibility_m'], 50, 10000)
     
     # Set all cities to London
     traffic_df['city'] = 'London'
@@ -155,10 +193,12 @@ def main():
     
     print(f"   Cleaned: {len(traffic_df)} records")
     
-    # Save as Parquet
-    traffic_file = 'cleaned_data/traffic_cleaned.parquet'
-    traffic_df.to_parquet(traffic_file, index=False)
-    print(f"   Saved: {traffic_file}")
+    # Categoricals become Parquet dictionary columns; city is the only one still stored as strings
+    traffic_df['city'] = traffic_df['city'].astype('category')
+    
+    # Serialize as Parquet in memory
+    traffic_buffer = to_parquet_buffer(traffic_df)
+    print(f"   Serialized: traffic_cleaned.parquet ({traffic_buffer.getbuffer().nbytes:,} bytes)")
     
     # ===== 3. UPLOAD TO SILVER LAYER =====
     print("\n3. Uploading to Silver layer...")
@@ -169,18 +209,20 @@ def main():
         print("   Created silver bucket")
     
     # Upload weather data
-    client.fput_object(
+    client.put_object(
         bucket_name="silver",
         object_name="weather_cleaned.parquet",
-        file_path=weather_file
+        data=weather_buffer,
+        length=weather_buffer.getbuffer().nbytes
     )
     print("   Uploaded: weather_cleaned.parquet")
     
     # Upload traffic data
-    client.fput_object(
+    client.put_object(
         bucket_name="silver",
         object_name="traffic_cleaned.parquet",
-        file_path=traffic_file
+        data=traffic_buffer,
+        length=traffic_buffer.getbuffer().nbytes
     )
     print("   Uploaded: traffic_cleaned.parquet")
     
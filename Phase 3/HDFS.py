@@ -1,29 +1,76 @@
 #!/usr/bin/env python3
 # phase3_hdfs.py - Copy cleaned data from MinIO Silver to HDFS
 import subprocess
-import os
 import time
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
 from minio import Minio
 import io
 
-def run_hdfs_command(command):
-    """Run HDFS command via Docker exec"""
-    cmd = f"sudo docker exec hadoop_namenode {command}"
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-    return result.returncode == 0, result.stdout.strip(), result.stderr.strip()
+# WebHDFS REST endpoint on the NameNode
+NAMENODE_URL = "http://localhost:9870"
+WEBHDFS_URL = f"{NAMENODE_URL}/webhdfs/v1"
+HDFS_USER = "root"
+CHUNK_SIZE = 128 * 1024 * 1024  # One HDFS block per part
+STREAM_CHUNK_SIZE = 8 * 1024 * 1024  # Read size when piping a part from MinIO
+UPLOAD_WORKERS = 8
+
+# Container whose Hadoop client copies straight from MinIO over S3A (see docker-compose.yml)
+NAMENODE_CONTAINER = "hadoop_namenode"
+S3A_OPTIONS = ["-Dfs.s3a.connection.maximum=32", "-Dfs.s3a.threads.max=32"]
+
+# One keep-alive connection pool shared by every WebHDFS call
+webhdfs_session = requests.Session()
+webhdfs_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+def webhdfs_request(method, hdfs_path, op, **params):
+    """Send a WebHDFS operation to the NameNode"""
+    params.update(op=op)
+    params["user.name"] = HDFS_USER
+    response = webhdfs_session.request(method, f"{WEBHDFS_URL}{hdfs_path}", params=params)
+    response.raise_for_status()
+    return response.json() if response.content else {}
+
+def webhdfs_create(hdfs_path, data):
+    """Write bytes to a new HDFS file through the DataNode WebHDFS picks"""
+    location = webhdfs_request("PUT", hdfs_path, "CREATE", overwrite="true", noredirect="true")["Location"]
+    # The DataNode hostname only resolves inside the Docker network; its port is published on localhost
+    url = urlsplit(location)
+    url = url._replace(netloc=f"localhost:{url.port}")
+    response = webhdfs_session.put(urlunsplit(url), data=data, headers={"Content-Type": "application/octet-stream"})
+    response.raise_for_status()
+
+def webhdfs_status(hdfs_path):
+    """Return the FileStatus of an HDFS path, or None if it does not exist"""
+    try:
+        return webhdfs_request("GET", hdfs_path, "GETFILESTATUS")["FileStatus"]
+    except requests.HTTPError as e:
+        if e.response.status_code == 404:
+            return None
+        raise
+
+def list_hdfs_directory(hdfs_path):
+    """Return the FileStatus entries of an HDFS directory in one LISTSTATUS call"""
+    return webhdfs_request("GET", hdfs_path, "LISTSTATUS")["FileStatuses"]["FileStatus"]
+
+def format_modified(status):
+    """Format a FileStatus modification time like hdfs dfs -ls does"""
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(status["modificationTime"] / 1000))
 
 def check_hdfs_status():
     """Check if HDFS is running"""
     print("Checking HDFS status...")
     
     # Check NameNode
-    success, stdout, stderr = run_hdfs_command("hdfs dfsadmin -report 2>/dev/null | head -20")
-    if success:
+    try:
+        webhdfs_request("GET", "/", "GETFILESTATUS")
         print("HDFS is running")
         return True
-    else:
+    except requests.RequestException as e:
         print("HDFS may not be running")
-        print(f"Error: {stderr}")
+        print(f"Error: {e}")
         return False
 
 def create_hdfs_directories():
@@ -38,26 +85,64 @@ def create_hdfs_directories():
     ]
     
     for directory in directories:
-        success, stdout, stderr = run_hdfs_command(f"hdfs dfs -mkdir -p {directory}")
-        if success:
-            print(f"Created: {directory}")
-        else:
-            # Directory might already exist
-            if "File exists" in stderr:
+        try:
+            if webhdfs_status(directory) is not None:
                 print(f"Directory exists: {directory}")
             else:
-                print(f"Failed to create {directory}: {stderr}")
+                webhdfs_request("PUT", directory, "MKDIRS")
+                print(f"Created: {directory}")
+        except requests.RequestException as e:
+            print(f"Failed to create {directory}: {e}")
     
     # List created directories
     print("\nHDFS directory structure:")
-    run_hdfs_command("hdfs dfs -ls -R /bigdata")
+    for status in list_hdfs_directory("/bigdata"):
+        print(f"  /bigdata/{status['pathSuffix']}")
 
-def download_from_minio():
-    """Download Parquet files from MinIO Silver to local"""
-    print("\nDownloading files from MinIO Silver...")
-    
-    # Create local directory
-    os.makedirs('hdfs_upload', exist_ok=True)
+def stream_minio_to_hdfs(client, minio_key, hdfs_path):
+    """Copy a Silver object to HDFS as parallel block-sized parts, without staging it locally"""
+    object_size = client.stat_object("silver", minio_key).size
+    offsets = range(0, max(object_size, 1), CHUNK_SIZE)
+    part_paths = [f"{hdfs_path}.part{i}" for i in range(len(offsets))]
+    
+    def upload_part(part_path, offset):
+        # Each part is its own ranged GET piped straight into the WebHDFS CREATE body
+        response = client.get_object("silver", minio_key, offset=offset,
+                                     length=min(CHUNK_SIZE, object_size - offset))
+        try:
+            webhdfs_create(part_path, response.stream(STREAM_CHUNK_SIZE))
+        finally:
+            response.close()
+            response.release_conn()
+    
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+        list(executor.map(upload_part, part_paths, offsets))
+    
+    # CONCAT appends the sources onto an existing file, so part0 becomes the target
+    target, sources = part_paths[0], part_paths[1:]
+    if sources:
+        webhdfs_request("POST", target, "CONCAT", sources=",".join(sources))
+    webhdfs_request("DELETE", hdfs_path, "DELETE")
+    webhdfs_request("PUT", target, "RENAME", destination=hdfs_path)
+    return webhdfs_request("GET", hdfs_path, "GETFILESTATUS")["FileStatus"]
+
+def copy_s3a_to_hdfs(minio_key, hdfs_path):
+    """Have the cluster copy a Silver object from MinIO over S3A; returns the file status, or None on failure"""
+    cmd = ["sudo", "docker", "exec", NAMENODE_CONTAINER, "hdfs", "dfs", *S3A_OPTIONS,
+           "-cp", "-f", f"s3a://silver/{minio_key}", hdfs_path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError as e:
+        print(f"  S3A copy failed: {e}")
+        return None
+    if result.returncode != 0:
+        print(f"  S3A copy failed: {result.stderr.strip()}")
+        return None
+    return webhdfs_status(hdfs_path)
+
+def upload_to_hdfs():
+    """Copy Parquet files from MinIO Silver into HDFS"""
+    print("\nCopying files from MinIO Silver to HDFS...")
     
     # Connect to MinIO
     client = Minio(
@@ -67,70 +152,27 @@ def download_from_minio():
         secure=False
     )
     
-    files_to_download = [
-        ("weather_cleaned.parquet", "hdfs_upload/weather.parquet"),
-        ("traffic_cleaned.parquet", "hdfs_upload/traffic.parquet")
+    upload_mapping = [
+        ("weather_cleaned.parquet", "/bigdata/weather/weather_data.parquet"),
+        ("traffic_cleaned.parquet", "/bigdata/traffic/traffic_data.parquet")
     ]
     
-    downloaded_files = []
+    uploaded_files = []
     
-    for minio_file, local_file in files_to_download:
+    for minio_file, hdfs_path in upload_mapping:
         try:
-            # Download from MinIO
-            response = client.get_object("silver", minio_file)
-            with open(local_file, 'wb') as file:
-                file.write(response.read())
-            
-            file_size = os.path.getsize(local_file)
-            print(f"Downloaded: {minio_file} -> {local_file} ({file_size:,} bytes)")
-            downloaded_files.append(local_file)
-            
+            # The bytes go MinIO -> cluster directly; streaming through this host is the fallback
+            status = copy_s3a_to_hdfs(minio_file, hdfs_path)
+            if status is None:
+                print("  Falling back to streaming through WebHDFS")
+                status = stream_minio_to_hdfs(client, minio_file, hdfs_path)
+            print(f"Uploaded to HDFS: silver/{minio_file} -> {hdfs_path}")
+            print(f"  Size: {status['length']} bytes")
+            uploaded_files.append(hdfs_path)
         except Exception as e:
-            print(f"Failed to download {minio_file}: {e}")
-    
-    return downloaded_files
-
-def upload_to_hdfs(local_files):
-    """Upload local files to HDFS"""
-    print("\nUploading files to HDFS...")
+            print(f"Failed to upload {minio_file}: {e}")
     
-    upload_mapping = [
-        ("hdfs_upload/weather.parquet", "/bigdata/weather/weather_data.parquet"),
-        ("hdfs_upload/traffic.parquet", "/bigdata/traffic/traffic_data.parquet")
-    ]
-    
-    for local_file, hdfs_path in upload_mapping:
-        if os.path.exists(local_file):
-            # Copy file to Docker container first
-            container_path = f"/tmp/{os.path.basename(local_file)}"
-            
-            # Copy to container
-            copy_cmd = f"sudo docker cp {local_file} hadoop_namenode:{container_path}"
-            copy_result = subprocess.run(copy_cmd, shell=True, capture_output=True, text=True)
-            
-            if copy_result.returncode == 0:
-                # Upload from container to HDFS
-                hdfs_cmd = f"hdfs dfs -put {container_path} {hdfs_path}"
-                success, stdout, stderr = run_hdfs_command(hdfs_cmd)
-                
-                if success:
-                    # Get file info from HDFS
-                    info_cmd = f"hdfs dfs -ls {hdfs_path}"
-                    _, info_out, _ = run_hdfs_command(info_cmd)
-                    print(f"Uploaded to HDFS: {hdfs_path}")
-                    
-                    # Show file size
-                    if info_out:
-                        parts = info_out.split()
-                        if len(parts) >= 5:
-                            size = parts[4]
-                            print(f"  Size: {size} bytes")
-                else:
-                    print(f"Failed to upload {local_file}: {stderr}")
-            else:
-                print(f"Failed to copy {local_file} to container: {copy_result.stderr}")
-        else:
-            print(f"Local file not found: {local_file}")
+    return uploaded_files
 
 def verify_hdfs_files():
     """Verify files were uploaded to HDFS"""
@@ -144,17 +186,11 @@ def verify_hdfs_files():
     all_good = True
     
     for hdfs_file in files_to_check:
-        success, stdout, stderr = run_hdfs_command(f"hdfs dfs -test -e {hdfs_file}")
-        if success:
-            # Get file details
-            success2, details, _ = run_hdfs_command(f"hdfs dfs -ls {hdfs_file}")
-            if success2 and details:
-                parts = details.split()
-                if len(parts) >= 8:
-                    size = parts[4]
-                    date = f"{parts[5]} {parts[6]} {parts[7]}"
-                    print(f"✓ {hdfs_file}")
-                    print(f"  Size: {size} bytes, Modified: {date}")
+        # One GETFILESTATUS answers both "does it exist" and "what are its details"
+        status = webhdfs_status(hdfs_file)
+        if status is not None:
+            print(f"✓ {hdfs_file}")
+            print(f"  Size: {status['length']} bytes, Modified: {format_modified(status)}")
         else:
             print(f"✗ Missing: {hdfs_file}")
             all_good = False
@@ -167,17 +203,17 @@ def show_hdfs_structure():
     print("HDFS DIRECTORY STRUCTURE")
     print("=" * 60)
     
-    # Show root of our project
-    run_hdfs_command("hdfs dfs -ls /")
-    
-    print("\n/bigdata directory:")
-    run_hdfs_command("hdfs dfs -ls /bigdata")
+    directories = ["/", "/bigdata", "/bigdata/weather", "/bigdata/traffic"]
     
-    print("\n/bigdata/weather directory:")
-    run_hdfs_command("hdfs dfs -ls /bigdata/weather")
+    # Fetch all listings concurrently over the shared session, then print in order
+    with ThreadPoolExecutor(max_workers=len(directories)) as executor:
+        listings = list(executor.map(list_hdfs_directory, directories))
     
-    print("\n/bigdata/traffic directory:")
-    run_hdfs_command("hdfs dfs -ls /bigdata/traffic")
+    for directory, listing in zip(directories, listings):
+        print(f"\n{directory} directory:")
+        for status in listing:
+            kind = "d" if status["type"] == "DIRECTORY" else "-"
+            print(f"  {kind} {status['length']:>12,} {format_modified(status)} {status['pathSuffix']}")
     
     print("=" * 60)
 
@@ -185,17 +221,30 @@ def check_hdfs_health():
     """Check HDFS health and storage"""
     print("\nHDFS Health Check:")
     
+    # Capacity and DataNode counts come from one NameNode JMX bean
+    response = webhdfs_session.get(f"{NAMENODE_URL}/jmx",
+                                   params={"qry": "Hadoop:service=NameNode,name=FSNamesystemState"})
+    response.raise_for_status()
+    state = response.json()["beans"][0]
+    
     # Check disk usage
     print("\nHDFS Disk Usage:")
-    run_hdfs_command("hdfs dfs -df -h")
+    print(f"  Capacity: {state['CapacityTotal']:,} bytes")
+    print(f"  Used: {state['CapacityUsed']:,} bytes")
+    print(f"  Remaining: {state['CapacityRemaining']:,} bytes")
     
     # Check DataNode status
     print("\nDataNode Status:")
-    run_hdfs_command("hdfs dfsadmin -report | grep -A 5 'Datanodes available:'")
+    print(f"  Live DataNodes: {state['NumLiveDataNodes']}")
+    print(f"  Dead DataNodes: {state['NumDeadDataNodes']}")
     
     # Check replication factor
     print("\nChecking replication settings...")
-    run_hdfs_command("hdfs dfs -stat %r /bigdata/weather/weather_data.parquet 2>/dev/null || echo 'Cannot get replication'")
+    status = webhdfs_status("/bigdata/weather/weather_data.parquet")
+    if status is not None:
+        print(f"  Replication: {status['replication']}")
+    else:
+        print("  Cannot get replication")
 
 def main():
     print("PHASE 3: HDFS INTEGRATION")
@@ -224,40 +273,26 @@ def main():
     # Step 2: Create HDFS directories
     create_hdfs_directories()
     
-    # Step 3: Download from MinIO Silver
-    local_files = download_from_minio()
+    # Step 3: Stream from MinIO Silver to HDFS
+    uploaded_files = upload_to_hdfs()
     
-    if not local_files:
-        print("No files downloaded from MinIO. Check Silver bucket.")
+    if not uploaded_files:
+        print("No files copied from MinIO. Check Silver bucket.")
         print("Run: sudo docker exec datalake_minio_setup mc ls local/silver/")
         return
     
-    # Step 4: Upload to HDFS
-    upload_to_hdfs(local_files)
-    
-    # Step 5: Verify upload
+    # Step 4: Verify upload
     if verify_hdfs_files():
         print("\n✓ All files successfully uploaded to HDFS")
     else:
         print("\n✗ Some files may be missing from HDFS")
     
-    # Step 6: Show HDFS structure
+    # Step 5: Show HDFS structure
     show_hdfs_structure()
     
-    # Step 7: Check HDFS health
+    # Step 6: Check HDFS health
     check_hdfs_health()
     
-    # Step 8: Cleanup local files
-    print("\nCleaning up local temporary files...")
-    for file in ['hdfs_upload/weather.parquet', 'hdfs_upload/traffic.parquet']:
-        if os.path.exists(file):
-            os.remove(file)
-            print(f"Removed: {file}")
-    
-    # Optional: Remove directory if empty
-    if os.path.exists('hdfs_upload') and not os.listdir('hdfs_upload'):
-        os.rmdir('hdfs_upload')
-    
     print("\n" + "=" * 60)
     print("PHASE 3 COMPLETE")
     print("=" * 60)
@@ -1,9 +1,39 @@
 #!/usr/bin/env python3
 # phase4_merge_fixed.py - Merge datasets and handle duplicate columns
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from minio import Minio
-import io
 import os
+import glob
+
+# Columns read from Silver: the join keys plus what the merged dataset keeps
+WEATHER_COLUMNS = ['date_time', 'city', 'season', 'temperature_c', 'humidity', 'rain_mm',
+                   'wind_speed_kmh', 'weather_condition', 'air_pressure_hpa', 'visibility_m']
+TRAFFIC_COLUMNS = ['date_time', 'city', 'area', 'vehicle_count', 'avg_speed_kmh',
+                   'accident_count', 'congestion_level', 'road_condition']
+
+# Downloaded parquet objects, keyed by ETag and shared by Phases 4, 5 and 6
+CACHE_DIR = '.cache'
+CACHE_VERSIONS = 2  # ETags kept per object
+
+def get_cached(client, bucket, object_name):
+    """Memory-map a MinIO object from the local cache, downloading it only when its ETag changes"""
+    etag = client.stat_object(bucket, object_name).etag
+    object_dir = os.path.join(CACHE_DIR, bucket, object_name)
+    local_file = os.path.join(object_dir, f"{etag}.parquet")
+    if not os.path.exists(local_file):
+        client.fget_object(bucket, object_name, local_file)
+        # Drop all but the newest versions of this object
+        cached = sorted(glob.glob(os.path.join(object_dir, '*.parquet')), key=os.path.getmtime, reverse=True)
+        for stale_file in cached[CACHE_VERSIONS:]:
+            os.remove(stale_file)
+    return pa.memory_map(local_file)
+
+def read_parquet_object(client, bucket, object_name, columns):
+    """Read the given columns of a cached parquet object"""
+    table = pq.ParquetFile(get_cached(client, bucket, object_name)).read(columns=columns)
+    return table.to_pandas(self_destruct=True, split_blocks=True)
 
 def main():
     print("PHASE 4: DATASET MERGING")
@@ -24,14 +54,12 @@ def main():
     print("\n1. Loading cleaned datasets...")
     
     # Load weather data
-    weather_data = client.get_object("silver", "weather_cleaned.parquet")
-    weather_df = pd.read_parquet(io.BytesIO(weather_data.read()))
+    weather_df = read_parquet_object(client, "silver", "weather_cleaned.parquet", WEATHER_COLUMNS)
     print(f"   Weather: {len(weather_df)} records, {len(weather_df.columns)} columns")
     print(f"   Weather columns: {list(weather_df.columns)}")
     
     # Load traffic data
-    traffic_data = client.get_object("silver", "traffic_cleaned.parquet")
-    traffic_df = pd.read_parquet(io.BytesIO(traffic_data.read()))
+    traffic_df = read_parquet_object(client, "silver", "traffic_cleaned.parquet", TRAFFIC_COLUMNS)
     print(f"   Traffic: {len(traffic_df)} records, {len(traffic_df.columns)} columns")
     print(f"   Traffic columns: {list(traffic_df.columns)}")
     
@@ -51,72 +79,34 @@ def main():
     weather_df['date_time'] = pd.to_datetime(weather_df['date_time'])
     traffic_df['date_time'] = pd.to_datetime(traffic_df['date_time'])
     
-    # Create hourly grouping for better matching
-    weather_df['hour'] = weather_df['date_time'].dt.floor('H')
-    traffic_df['hour'] = traffic_df['date_time'].dt.floor('H')
+    # Create hourly grouping for better matching, as int64 nanoseconds so the
+    # merge hashes integers instead of Timestamps
+    weather_df['hour'] = weather_df['date_time'].dt.floor('H').astype('int64')
+    traffic_df['hour'] = traffic_df['date_time'].dt.floor('H').astype('int64')
     
-    # 4. Merge datasets with proper suffix handling
-    print("\n4. Merging datasets...")
+    # Encode city against one shared category set so equal names get equal codes
+    cities = pd.Index(weather_df['city'].unique()).union(traffic_df['city'].unique())
+    weather_df['city_code'] = pd.Categorical(weather_df['city'], categories=cities).codes
+    traffic_df['city_code'] = pd.Categorical(traffic_df['city'], categories=cities).codes
+    
+    # Traffic timestamps and city are only needed for the keys; weather's are kept
+    traffic_df = traffic_df.drop(columns=['date_time', 'city'])
     
-    # Determine which columns get which suffix
-    # Columns that are in both datasets get suffixes
-    # Columns that are unique keep their names
+    # 4. Merge datasets
+    print("\n4. Merging datasets...")
     
-    # First, let's see what happens with standard merge
+    # Both sides are projected to their own columns, so only the keys overlap
     merged_df = pd.merge(
         weather_df,
         traffic_df,
-        left_on=['hour', 'city'],
-        right_on=['hour', 'city'],
-        how='inner',
-        suffixes=('_weather', '_traffic')
+        on=['hour', 'city_code'],
+        how='inner'
     )
     
     print(f"   Initial merge: {len(merged_df)} records, {len(merged_df.columns)} columns")
     
-    # 5. Clean up merged dataset
-    print("\n5. Cleaning merged dataset...")
-    
-    # Remove the helper hour column
-    if 'hour' in merged_df.columns:
-        merged_df = merged_df.drop(columns=['hour'])
-    
-    # Handle duplicate city columns
-    if 'city_traffic' in merged_df.columns and 'city_weather' in merged_df.columns:
-        # They should both be 'London', drop one
-        merged_df = merged_df.drop(columns=['city_traffic'])
-        merged_df = merged_df.rename(columns={'city_weather': 'city'})
-    
-    # Handle duplicate date_time columns
-    if 'date_time_traffic' in merged_df.columns and 'date_time_weather' in merged_df.columns:
-        # Use weather date_time (should be same), drop traffic
-        merged_df = merged_df.drop(columns=['date_time_traffic'])
-        merged_df = merged_df.rename(columns={'date_time_weather': 'date_time'})
-    
-    # Handle duplicate visibility columns
-    if 'visibility_m_weather' in merged_df.columns and 'visibility_m_traffic' in merged_df.columns:
-        # Use weather visibility, rename it
-        merged_df['visibility_m'] = merged_df['visibility_m_weather']
-        merged_df = merged_df.drop(columns=['visibility_m_weather', 'visibility_m_traffic'])
-    
-    # Check for any other duplicates
-    duplicate_suffixes = ['_weather', '_traffic']
-    for suffix in duplicate_suffixes:
-        cols_with_suffix = [col for col in merged_df.columns if col.endswith(suffix)]
-        for col in cols_with_suffix:
-            base_col = col.replace(suffix, '')
-            other_suffix = '_traffic' if suffix == '_weather' else '_weather'
-            other_col = base_col + other_suffix
-            
-            if other_col in merged_df.columns:
-                print(f"   Found duplicate: {col} and {other_col}")
-                # Keep the _weather version for weather data, _traffic for traffic data
-                if 'weather' in col:
-                    merged_df[base_col] = merged_df[col]
-                merged_df = merged_df.drop(columns=[col, other_col])
-    
-    # 6. Select final columns - only keep unique ones
-    print("\n6. Selecting final columns...")
+    # 5. Select final columns - only keep unique ones
+    print("\n5. Selecting final columns...")
     
     # Define which columns we want in final dataset
     final_columns = []
@@ -154,31 +144,35 @@ def main():
     print(f"   Final dataset: {len(final_df)} records, {len(final_df.columns)} columns")
     print(f"   Final columns: {list(final_df.columns)}")
     
-    # 7. Save merged dataset
-    print("\n7. Saving merged dataset...")
+    # 6. Save merged dataset
+    print("\n6. Saving merged dataset...")
     
-    # Save locally
-    local_file = './merged_dataset.parquet'
-    final_df.to_parquet(local_file, index=False)
-    print(f"   Saved locally: {local_file}")
+    # Serialize into memory; zstd keeps the Gold object small for Phases 5 and 6
+    sink = pa.BufferOutputStream()
+    pq.write_table(pa.Table.from_pandas(final_df, preserve_index=False), sink,
+                   compression='zstd', compression_level=3, row_group_size=100_000)
+    parquet_buffer = sink.getvalue()
+    print(f"   Serialized: {parquet_buffer.size:,} bytes (zstd)")
     
-    # 8. Upload to MinIO Gold
-    print("\n8. Uploading to MinIO...")
+    # 7. Upload to MinIO Gold
+    print("\n7. Uploading to MinIO...")
     
     # Create Gold bucket if needed
     if not client.bucket_exists("gold"):
         client.make_bucket("gold")
         print("   Created gold bucket")
     
-    # Upload Parquet file
-    client.fput_object(
+    # Upload Parquet buffer
+    client.put_object(
         bucket_name="gold",
         object_name="merged_dataset.parquet",
-        file_path=local_file
+        data=pa.BufferReader(parquet_buffer),
+        length=parquet_buffer.size,
+        content_type="application/octet-stream"
     )
     print("   Uploaded to gold: merged_dataset.parquet")
     
-    # 9. Summary
+    # 8. Summary
     print("\n" + "=" * 50)
     print("MERGE COMPLETE")
     print("=" * 50)
@@ -186,8 +180,8 @@ def main():
     print(f"Unique columns: {len(final_df.columns)}")
     
     print("\nDataset structure:")
-    for i, col in enumerate(final_df.columns, 1):
-        non_null = final_df[col].count()
+    non_null_counts = final_df.count()
+    for i, (col, non_null) in enumerate(non_null_counts.items(), 1):
         print(f"  {i:2d}. {col:25s} ({non_null} non-null values)")
     
     print("\nSample data:")
@@ -2,10 +2,32 @@
 # phase5_mc.py - Monte Carlo Simulation using actual data from MinIO Gold
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Headless rendering straight to PNG
 import matplotlib.pyplot as plt
+import pyarrow as pa
+import pyarrow.parquet as pq
 from minio import Minio
-import io
 import os
+import glob
+from concurrent.futures import ThreadPoolExecutor
+
+# Downloaded parquet objects, keyed by ETag and shared by Phases 4, 5 and 6
+CACHE_DIR = '.cache'
+CACHE_VERSIONS = 2  # ETags kept per object
+
+def get_cached(client, bucket, object_name):
+    """Memory-map a MinIO object from the local cache, downloading it only when its ETag changes"""
+    etag = client.stat_object(bucket, object_name).etag
+    object_dir = os.path.join(CACHE_DIR, bucket, object_name)
+    local_file = os.path.join(object_dir, f"{etag}.parquet")
+    if not os.path.exists(local_file):
+        client.fget_object(bucket, object_name, local_file)
+        # Drop all but the newest versions of this object
+        cached = sorted(glob.glob(os.path.join(object_dir, '*.parquet')), key=os.path.getmtime, reverse=True)
+        for stale_file in cached[CACHE_VERSIONS:]:
+            os.remove(stale_file)
+    return pa.memory_map(local_file)
 
 def main():
     print("PHASE 5: MONTE CARLO SIMULATION")
@@ -26,8 +48,13 @@ def main():
     print("\n1. Loading merged dataset from MinIO Gold...")
     
     try:
-        response = client.get_object("gold", "merged_dataset.parquet")
-        df = pd.read_parquet(io.BytesIO(response.read()))
+        parquet_file = pq.ParquetFile(get_cached(client, "gold", "merged_dataset.parquet"))
+        
+        # Only the weather inputs and the two traffic outcomes are used below
+        wanted = ['temperature_c', 'rain_mm', 'humidity', 'wind_speed_kmh', 'visibility_m',
+                  'congestion_level', 'accident_count']
+        columns = [col for col in wanted if col in parquet_file.schema_arrow.names]
+        df = parquet_file.read(columns=columns).to_pandas(self_destruct=True, split_blocks=True)
         print(f"   Loaded {len(df)} records")
         
     except Exception as e:
@@ -37,15 +64,24 @@ def main():
     # 2. Prepare data
     print("\n2. Preparing data for simulation...")
     
-    # Ensure numeric columns
+    # Ensure numeric columns, cast to float32 in one pass
     numeric_cols = ['temperature_c', 'rain_mm', 'humidity', 'wind_speed_kmh', 'visibility_m']
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+    df = df.astype({col: 'float32' for col in numeric_cols})
     
     # Handle missing values
     df = df.dropna(subset=numeric_cols)
     
+    # Pull the weather columns out once; scenarios and sampling index into these arrays
+    columns = {col: df[col].to_numpy() for col in numeric_cols}
+    temp = columns['temperature_c']
+    rain = columns['rain_mm']
+    humidity = columns['humidity']
+    wind = columns['wind_speed_kmh']
+    visibility = columns['visibility_m']
+    
+    # Only the columns simulate_probabilities reads are gathered for each sample
+    sampled = {col: columns[col] for col in ['rain_mm', 'temperature_c', 'visibility_m', 'wind_speed_kmh']}
+    
     # 3. Calculate baseline probabilities from actual data
     print("\n3. Calculating baseline probabilities...")
     
@@ -74,32 +110,26 @@ def main():
     scenarios = [
         {
             'name': 'heavy_rain',
-            'condition': 'rain_mm > 20',
             'description': 'Heavy Rain (> 20mm)'
         },
         {
             'name': 'temperature_extreme_cold', 
-            'condition': 'temperature_c < 0',
             'description': 'Extreme Cold (< 0°C)'
         },
         {
             'name': 'temperature_extreme_hot',
-            'condition': 'temperature_c > 30',
             'description': 'Extreme Heat (> 30°C)'
         },
         {
             'name': 'high_humidity',
-            'condition': 'humidity > 85',
             'description': 'High Humidity (> 85%)'
         },
         {
             'name': 'low_visibility',
-            'condition': 'visibility_m < 500',
             'description': 'Low Visibility (< 500m)'
         },
         {
             'name': 'strong_winds',
-            'condition': 'wind_speed_kmh > 60',
             'description': 'Strong Winds (> 60 km/h)'
         }
     ]
@@ -107,88 +137,73 @@ def main():
     # Add normal conditions for comparison
     scenarios.append({
         'name': 'normal_conditions',
-        'condition': '(temperature_c >= 10) & (temperature_c <= 25) & (rain_mm < 5) & (humidity <= 70) & (wind_speed_kmh < 30) & (visibility_m > 1000)',
         'description': 'Normal Conditions'
     })
     
+    # Row mask of each scenario, computed once against the column arrays
+    masks = {
+        'heavy_rain': rain > 20,
+        'temperature_extreme_cold': temp < 0,
+        'temperature_extreme_hot': temp > 30,
+        'high_humidity': humidity > 85,
+        'low_visibility': visibility < 500,
+        'strong_winds': wind > 60,
+        'normal_conditions': ((temp >= 10) & (temp <= 25) & (rain < 5) &
+                              (humidity <= 70) & (wind < 30) & (visibility > 1000))
+    }
+    
     # 5. Run Monte Carlo simulations using ONLY actual data
     print("\n5. Running Monte Carlo simulations...")
     
     n_simulations = 5000
     results = []
     
-    for scenario in scenarios:
-        print(f"   Simulating: {scenario['description']}")
-        
-        # Filter data for this scenario using actual data only
-        try:
-            scenario_data = df.query(scenario['condition'])
-        except:
-            # If query fails, filter manually
-            if scenario['name'] == 'heavy_rain':
-                scenario_data = df[df['rain_mm'] > 20]
-            elif scenario['name'] == 'temperature_extreme_cold':
-                scenario_data = df[df['temperature_c'] < 0]
-            elif scenario['name'] == 'temperature_extreme_hot':
-                scenario_data = df[df['temperature_c'] > 30]
-            elif scenario['name'] == 'high_humidity':
-                scenario_data = df[df['humidity'] > 85]
-            elif scenario['name'] == 'low_visibility':
-                scenario_data = df[df['visibility_m'] < 500]
-            elif scenario['name'] == 'strong_winds':
-                scenario_data = df[df['wind_speed_kmh'] > 60]
-            else:  # normal_conditions
-                scenario_data = df[
-                    (df['temperature_c'] >= 10) & 
-                    (df['temperature_c'] <= 25) & 
-                    (df['rain_mm'] < 5) &
-                    (df['humidity'] <= 70) &
-                    (df['wind_speed_kmh'] < 30) &
-                    (df['visibility_m'] > 1000)
-                ]
+    # One seeded generator drives every draw, and each scenario gets its own
+    # row of noise drawn up front, so runs are reproducible
+    rng = np.random.default_rng(42)
+    jam_noise = rng.normal(0, 0.03, (len(scenarios), n_simulations)).astype(np.float32)
+    accident_noise = rng.normal(0, 0.01, (len(scenarios), n_simulations)).astype(np.float32)
+    
+    # Row draws stay in scenario order on the one generator; the simulations
+    # themselves are independent and run side by side
+    scenario_executor = ThreadPoolExecutor(max_workers=min(len(scenarios), os.cpu_count() or 1))
+    pending = []
+    
+    for i, scenario in enumerate(scenarios):
+        # Rows of this scenario in the actual data
+        scenario_rows = np.flatnonzero(masks[scenario['name']])
         
-        if len(scenario_data) < 10:
-            print(f"      Warning: Only {len(scenario_data)} records for this scenario")
+        if len(scenario_rows) < 10:
             # Use all data but adjust probabilities
-            simulation_data = df
+            simulation_rows = np.arange(len(df))
             adjustment_factor = 1.5  # Assume worse conditions
         else:
-            simulation_data = scenario_data
+            simulation_rows = scenario_rows
             adjustment_factor = 1.0
         
-        # Run Monte Carlo simulations using actual data samples
-        jam_probs = []
-        accident_probs = []
+        # Run Monte Carlo simulations using actual data samples,
+        # drawing every sampled record of the scenario in one batch
+        idx = None
+        if len(simulation_rows) > 0:
+            idx = simulation_rows[rng.integers(0, len(simulation_rows), n_simulations)]
         
-        for i in range(n_simulations):
-            # Sample from actual data
-            if len(simulation_data) > 0:
-                sample = simulation_data.sample(n=1, replace=True).iloc[0]
-                
-                # Calculate probabilities based on actual sample
-                jam_prob = calculate_jam_from_sample(sample, base_jam_prob, adjustment_factor)
-                accident_prob = calculate_accident_from_sample(sample, base_accident_prob, adjustment_factor)
-                
-                jam_probs.append(jam_prob)
-                accident_probs.append(accident_prob)
+        future = scenario_executor.submit(
+            run_scenario, sampled, idx, base_jam_prob, base_accident_prob,
+            adjustment_factor, jam_noise[i], accident_noise[i])
+        pending.append((scenario, len(scenario_rows), future))
+    
+    for scenario, n_actual_records, future in pending:
+        print(f"   Simulating: {scenario['description']}")
+        if n_actual_records < 10:
+            print(f"      Warning: Only {n_actual_records} records for this scenario")
         
-        # Calculate statistics
-        if jam_probs:
-            avg_jam = np.mean(jam_probs)
-            std_jam = np.std(jam_probs)
-            avg_accident = np.mean(accident_probs)
-            std_accident = np.std(accident_probs)
-        else:
-            avg_jam = base_jam_prob * adjustment_factor
-            std_jam = 0.1
-            avg_accident = base_accident_prob * adjustment_factor
-            std_accident = 0.05
+        avg_jam, std_jam, avg_accident, std_accident = future.result()
         
         # Store results
         result = {
             'scenario': scenario['name'],
             'description': scenario['description'],
-            'n_actual_records': len(scenario_data),
+            'n_actual_records': n_actual_records,
             'avg_traffic_jam_prob': avg_jam,
             'std_traffic_jam_prob': std_jam,
             'avg_accident_prob': avg_accident,
@@ -200,9 +215,16 @@ def main():
         print(f"      Traffic jam probability: {avg_jam:.3f} (±{std_jam:.3f})")
         print(f"      Accident probability: {avg_accident:.3f} (±{std_accident:.3f})")
     
+    scenario_executor.shutdown()
+    
     # 6. Save results
     print("\n6. Saving simulation results...")
     
+    # Deliverables upload in the background as soon as each one is written,
+    # so the PUTs overlap with each other and with plot rendering
+    upload_executor = ThreadPoolExecutor(max_workers=4)
+    uploads = {}
+    
     # Save to CSV
     results_df = pd.DataFrame(results)
     csv_file = 'phase5_results/simulation_results.csv'
@@ -210,8 +232,8 @@ def main():
     print(f"   Saved: {csv_file}")
     
     # Upload to MinIO Gold
-    client.fput_object("gold", "simulation_results.csv", csv_file)
-    print("   Uploaded to MinIO Gold: simulation_results.csv")
+    uploads["simulation_results.csv"] = upload_executor.submit(
+        client.fput_object, "gold", "simulation_results.csv", csv_file)
     
     # 7. Create plots
     print("\n7. Creating visualization plots...")
@@ -241,12 +263,13 @@ def main():
     plt.tight_layout()
     
     jam_plot = 'phase5_results/congestion_probability.png'
-    plt.savefig(jam_plot, dpi=300)
+    plt.savefig(jam_plot, dpi=100)
+    plt.close()
     print(f"   Saved: {jam_plot}")
     
     # Upload plot to MinIO
-    client.fput_object("gold", "congestion_probability.png", jam_plot)
-    print("   Uploaded to MinIO Gold: congestion_probability.png")
+    uploads["congestion_probability.png"] = upload_executor.submit(
+        client.fput_object, "gold", "congestion_probability.png", jam_plot)
     
     # Plot 2: Comparison of jam vs accident probabilities
     plt.figure(figsize=(10, 6))
@@ -265,11 +288,13 @@ def main():
     plt.tight_layout()
     
     comp_plot = 'phase5_results/jam_vs_accident.png'
-    plt.savefig(comp_plot, dpi=300)
+    plt.savefig(comp_plot, dpi=100)
+    plt.close()
     print(f"   Saved: {comp_plot}")
     
     # Upload plot to MinIO
-    client.fput_object("gold", "jam_vs_accident.png", comp_plot)
+    uploads["jam_vs_accident.png"] = upload_executor.submit(
+        client.fput_object, "gold", "jam_vs_accident.png", comp_plot)
     
     # 8. Generate distribution plot from actual simulation data
     print("\n8. Generating probability distributions...")
@@ -278,28 +303,33 @@ def main():
     plt.figure(figsize=(10, 6))
     
     # Simulate normal vs heavy rain scenarios
-    normal_data = df.query('rain_mm < 5 and visibility_m > 1000')
-    heavy_rain_data = df.query('rain_mm > 20')
+    normal_rows = np.flatnonzero((rain < 5) & (visibility > 1000))
+    heavy_rain_rows = np.flatnonzero(masks['heavy_rain'])
     
     normal_probs = []
     heavy_rain_probs = []
     
-    for _ in range(1000):
-        if len(normal_data) > 0:
-            sample = normal_data.sample(n=1, replace=True).iloc[0]
-            prob = calculate_jam_from_sample(sample, base_jam_prob, 1.0)
-            normal_probs.append(prob)
-        
-        if len(heavy_rain_data) > 0:
-            sample = heavy_rain_data.sample(n=1, replace=True).iloc[0]
-            prob = calculate_jam_from_sample(sample, base_jam_prob, 1.5)
-            heavy_rain_probs.append(prob)
+    # Noise for both distribution runs, drawn in one go like the scenarios'
+    dist_jam_noise = rng.normal(0, 0.03, (2, 1000)).astype(np.float32)
+    dist_accident_noise = rng.normal(0, 0.01, (2, 1000)).astype(np.float32)
+    
+    if len(normal_rows) > 0:
+        idx = normal_rows[rng.integers(0, len(normal_rows), 1000)]
+        sample = {col: values[idx] for col, values in sampled.items()}
+        normal_probs, _ = simulate_probabilities(sample, base_jam_prob, base_accident_prob, 1.0,
+                                                 dist_jam_noise[0], dist_accident_noise[0])
+    
+    if len(heavy_rain_rows) > 0:
+        idx = heavy_rain_rows[rng.integers(0, len(heavy_rain_rows), 1000)]
+        sample = {col: values[idx] for col, values in sampled.items()}
+        heavy_rain_probs, _ = simulate_probabilities(sample, base_jam_prob, base_accident_prob, 1.5,
+                                                     dist_jam_noise[1], dist_accident_noise[1])
     
     # Plot distributions
-    if normal_probs:
-        plt.hist(normal_probs, bins=30, alpha=0.5, label='Normal Conditions', density=True)
-    if heavy_rain_probs:
-        plt.hist(heavy_rain_probs, bins=30, alpha=0.5, label='Heavy Rain', density=True)
+    if len(normal_probs):
+        plt.hist(normal_probs, bins=30, alpha=0.5, label='Normal Conditions', density=True, rasterized=True)
+    if len(heavy_rain_probs):
+        plt.hist(heavy_rain_probs, bins=30, alpha=0.5, label='Heavy Rain', density=True, rasterized=True)
     
     plt.xlabel('Traffic Jam Probability')
     plt.ylabel('Density')
@@ -308,12 +338,19 @@ def main():
     plt.grid(True, alpha=0.3)
     
     dist_plot = 'phase5_results/congestion_distribution.png'
-    plt.savefig(dist_plot, dpi=300)
+    plt.savefig(dist_plot, dpi=100)
+    plt.close()
     print(f"   Saved: {dist_plot}")
     
     # Upload plot to MinIO
-    client.fput_object("gold", "congestion_distribution.png", dist_plot)
-    print("   Uploaded to MinIO Gold: congestion_distribution.png")
+    uploads["congestion_distribution.png"] = upload_executor.submit(
+        client.fput_object, "gold", "congestion_distribution.png", dist_plot)
+    
+    # Wait for every upload before reporting
+    for object_name, upload in uploads.items():
+        upload.result()
+        print(f"   Uploaded to MinIO Gold: {object_name}")
+    upload_executor.shutdown()
     
     # 9. Summary
     print("\n" + "=" * 60)
@@ -329,14 +366,14 @@ def main():
     print("-" * 40)
     
     # Find highest risk scenarios
-    sorted_by_jam = sorted(results, key=lambda x: x['avg_traffic_jam_prob'], reverse=True)
+    highest_jam = max(results, key=lambda x: x['avg_traffic_jam_prob'])
     
-    print(f"\nHighest traffic jam risk: {sorted_by_jam[0]['description']}")
-    print(f"  Probability: {sorted_by_jam[0]['avg_traffic_jam_prob']:.3f}")
+    print(f"\nHighest traffic jam risk: {highest_jam['description']}")
+    print(f"  Probability: {highest_jam['avg_traffic_jam_prob']:.3f}")
     
-    sorted_by_accident = sorted(results, key=lambda x: x['avg_accident_prob'], reverse=True)
-    print(f"\nHighest accident risk: {sorted_by_accident[0]['description']}")
-    print(f"  Probability: {sorted_by_accident[0]['avg_accident_prob']:.3f}")
+    highest_accident = max(results, key=lambda x: x['avg_accident_prob'])
+    print(f"\nHighest accident risk: {highest_accident['description']}")
+    print(f"  Probability: {highest_accident['avg_accident_prob']:.3f}")
     
     print("\n" + "=" * 60)
     print("Deliverables saved to MinIO Gold layer:")
@@ -346,58 +383,64 @@ def main():
     print("  - congestion_distribution.png")
     print("=" * 60)
 
-def calculate_jam_from_sample(sample, base_prob, adjustment_factor):
-    """Calculate traffic jam probability from actual data sample"""
-    prob = base_prob * adjustment_factor
-    
-    # Adjust based on actual weather conditions in sample
-    if 'rain_mm' in sample and sample['rain_mm'] > 20:
-        prob *= 1.8
-    elif 'rain_mm' in sample and sample['rain_mm'] > 10:
-        prob *= 1.4
-    
-    if 'temperature_c' in sample:
-        if sample['temperature_c'] < 0 or sample['temperature_c'] > 30:
-            prob *= 1.3
-    
-    if 'visibility_m' in sample and sample['visibility_m'] < 500:
-        prob *= 1.5
-    
-    if 'wind_speed_kmh' in sample and sample['wind_speed_kmh'] > 60:
-        prob *= 1.2
-    
-    # Add small random noise for Monte Carlo
-    prob += np.random.normal(0, 0.03)
-    
-    # Ensure bounds
-    return max(0.01, min(prob, 0.95))
+def run_scenario(sampled, idx, base_jam_prob, base_accident_prob, adjustment_factor,
+                 jam_noise, accident_noise):
+    """Simulate one scenario on the sampled rows and return the mean and std of both probabilities"""
+    if idx is None:
+        return (base_jam_prob * adjustment_factor, 0.1,
+                base_accident_prob * adjustment_factor, 0.05)
+    
+    sample = {col: values[idx] for col, values in sampled.items()}
+    
+    # Calculate probabilities based on actual samples
+    jam_probs, accident_probs = simulate_probabilities(
+        sample, base_jam_prob, base_accident_prob, adjustment_factor,
+        jam_noise, accident_noise)
+    
+    # Calculate statistics
+    return np.mean(jam_probs), np.std(jam_probs), np.mean(accident_probs), np.std(accident_probs)
 
-def calculate_accident_from_sample(sample, base_prob, adjustment_factor):
-    """Calculate accident probability from actual data sample"""
-    prob = base_prob * adjustment_factor
-    
-    # Adjust based on actual weather conditions
-    if 'rain_mm' in sample:
-        if sample['rain_mm'] > 30:
-            prob *= 3.0
-        elif sample['rain_mm'] > 20:
-            prob *= 2.5
-        elif sample['rain_mm'] > 10:
-            prob *= 2.0
-    
-    if 'visibility_m' in sample and sample['visibility_m'] < 200:
-        prob *= 2.5
-    elif 'visibility_m' in sample and sample['visibility_m'] < 500:
-        prob *= 1.8
-    
-    if 'wind_speed_kmh' in sample and sample['wind_speed_kmh'] > 60:
-        prob *= 1.5
-    
-    # Add small random noise
-    prob += np.random.normal(0, 0.01)
+def simulate_probabilities(sample, base_jam_prob, base_accident_prob, adjustment_factor,
+                           jam_noise, accident_noise):
+    """Calculate traffic jam and accident probabilities for a batch of sampled records"""
+    rain = sample['rain_mm']
+    temp = sample['temperature_c']
+    visibility = sample['visibility_m']
+    n = len(rain)
+    
+    # Weather conditions shared by both models, evaluated once per batch
+    rain_over_30 = rain > 30
+    rain_over_20 = rain > 20
+    rain_over_10 = rain > 10
+    visibility_under_500 = visibility < 500
+    strong_wind = sample['wind_speed_kmh'] > 60
+    
+    # Traffic jam: scale in place by each condition the sample meets
+    jam_prob = np.full(n, base_jam_prob * adjustment_factor, dtype=np.float32)
+    jam_prob[rain_over_20] *= 1.8
+    jam_prob[rain_over_10 & ~rain_over_20] *= 1.4
+    jam_prob[(temp < 0) | (temp > 30)] *= 1.3
+    jam_prob[visibility_under_500] *= 1.5
+    jam_prob[strong_wind] *= 1.2
+    
+    # Accident
+    accident_prob = np.full(n, base_accident_prob * adjustment_factor, dtype=np.float32)
+    accident_prob[rain_over_30] *= 3.0
+    accident_prob[rain_over_20 & ~rain_over_30] *= 2.5
+    accident_prob[rain_over_10 & ~rain_over_20] *= 2.0
+    visibility_under_200 = visibility < 200
+    accident_prob[visibility_under_200] *= 2.5
+    accident_prob[visibility_under_500 & ~visibility_under_200] *= 1.8
+    accident_prob[strong_wind] *= 1.5
+    
+    # Add the pre-drawn Monte Carlo noise
+    jam_prob += jam_noise
+    accident_prob += accident_noise
     
     # Ensure bounds
-    return max(0.001, min(prob, 0.5))
+    np.clip(jam_prob, 0.01, 0.95, out=jam_prob)
+    np.clip(accident_prob, 0.001, 0.5, out=accident_prob)
+    return jam_prob, accident_prob
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,14 +2,32 @@
 # phase6_factor_analysis.py - Factor Analysis for weather impact on traffic
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+import pyarrow as pa
+import pyarrow.parquet as pq
 from minio import Minio
-import io
+import urllib3
 import os
-from sklearn.preprocessing import StandardScaler
-from factor_analyzer import FactorAnalyzer
-from factor_analyzer.factor_analyzer import calculate_bartlett_sphericity, calculate_kmo
+import glob
+import importlib.util
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Downloaded parquet objects, keyed by ETag and shared by Phases 4, 5 and 6
+CACHE_DIR = '.cache'
+CACHE_VERSIONS = 2  # ETags kept per object
+
+def get_cached(client, bucket, object_name):
+    """Memory-map a MinIO object from the local cache, downloading it only when its ETag changes"""
+    etag = client.stat_object(bucket, object_name).etag
+    object_dir = os.path.join(CACHE_DIR, bucket, object_name)
+    local_file = os.path.join(object_dir, f"{etag}.parquet")
+    if not os.path.exists(local_file):
+        client.fget_object(bucket, object_name, local_file)
+        # Drop all but the newest versions of this object
+        cached = sorted(glob.glob(os.path.join(object_dir, '*.parquet')), key=os.path.getmtime, reverse=True)
+        for stale_file in cached[CACHE_VERSIONS:]:
+            os.remove(stale_file)
+    return pa.memory_map(local_file)
 
 def main():
     print("PHASE 6: FACTOR ANALYSIS")
@@ -17,33 +35,32 @@ def main():
     print("Identifying weather variables with strongest effect on traffic patterns")
     print("=" * 60)
     
-    # Connect to MinIO
+    # Connect to MinIO, with enough pooled keep-alive connections for the
+    # download and every concurrent result upload
     client = Minio(
         "localhost:9000",
         access_key="admin",
         secret_key="password123",
-        secure=False
+        secure=False,
+        http_client=urllib3.PoolManager(
+            num_pools=1,
+            maxsize=8,
+            timeout=urllib3.Timeout(connect=300, read=300),
+            retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+        )
     )
     
     # Create directories
     os.makedirs('phase6_results', exist_ok=True)
     
+    # Each result file starts uploading in the background once it is written,
+    # overlapping its read and PUT with the remaining analysis
+    upload_executor = ThreadPoolExecutor(max_workers=5)
+    uploads = {}
+    
     # 1. Load merged dataset from Gold layer
     print("\n1. Loading merged dataset from MinIO Gold...")
     
-    try:
-        response = client.get_object("gold", "merged_dataset.parquet")
-        df = pd.read_parquet(io.BytesIO(response.read()))
-        print(f"   Loaded {len(df)} records")
-        print(f"   Columns: {list(df.columns)}")
-        
-    except Exception as e:
-        print(f"   Error loading data: {e}")
-        return
-    
-    # 2. Select features for factor analysis
-    print("\n2. Selecting features for factor analysis...")
-    
     # Define feature mapping based on available columns
     feature_mapping = {
         'temperature': ['temperature_c', 'temp', 'temperature'],
@@ -57,46 +74,80 @@ def main():
         'accident_count': ['accident_count', 'accidents']
     }
     
-    # Find actual column names
+    try:
+        parquet_file = pq.ParquetFile(get_cached(client, "gold", "merged_dataset.parquet"))
+        
+        # Only read the columns that can map to a feature
+        candidates = {col for cols in feature_mapping.values() for col in cols}
+        columns = [col for col in parquet_file.schema_arrow.names if col in candidates]
+        df = parquet_file.read(columns=columns).to_pandas(self_destruct=True, split_blocks=True)
+        print(f"   Loaded {len(df)} records")
+        print(f"   Columns: {list(df.columns)}")
+        
+    except Exception as e:
+        print(f"   Error loading data: {e}")
+        return
+    
+    # 2. Select features for factor analysis
+    print("\n2. Selecting features for factor analysis...")
+    
+    # Find actual column names: the first alias of each feature that is present
+    available = set(df.columns)
     selected_features = {}
-    selected_data = pd.DataFrame()
     
     for feature_name, possible_cols in feature_mapping.items():
-        found = False
-        for col in possible_cols:
-            if col in df.columns:
-                selected_data[feature_name] = df[col]
-                selected_features[feature_name] = col
-                found = True
-                print(f"   ✓ {feature_name}: using '{col}'")
-                break
-        
-        if not found:
+        col = next((col for col in possible_cols if col in available), None)
+        if col is not None:
+            selected_features[feature_name] = col
+            print(f"   ✓ {feature_name}: using '{col}'")
+        else:
             print(f"   ✗ {feature_name}: column not found")
     
-    print(f"\n   Selected {len(selected_data.columns)} features for analysis")
+    # Gather every selected column at once, named by feature
+    selected_data = df[list(selected_features.values())].rename(
+        columns={col: feature_name for feature_name, col in selected_features.items()})
+    
+    # Feature names, cached once for every frame and report section below
+    feature_names = tuple(selected_data.columns)
+    print(f"\n   Selected {len(feature_names)} features for analysis")
     
     # 3. Prepare data for factor analysis
     print("\n3. Preparing data for factor analysis...")
     
-    # Remove rows with missing values
-    data_clean = selected_data.dropna()
-    print(f"   Records after removing missing values: {len(data_clean)}")
+    # Remove rows with missing values while moving to one contiguous matrix;
+    # the boolean gather is the only copy and is standardized in place below
+    data_scaled = selected_data.to_numpy(dtype=np.float64, na_value=np.nan)
+    data_scaled = data_scaled[~np.isnan(data_scaled).any(axis=1)]
+    print(f"   Records after removing missing values: {len(data_scaled)}")
     
-    if len(data_clean) < 50:
+    if len(data_scaled) < 50:
         print("   Warning: Insufficient data for factor analysis")
         return
     
-    # Standardize the data
-    scaler = StandardScaler()
-    data_scaled = scaler.fit_transform(data_clean)
-    data_scaled_df = pd.DataFrame(data_scaled, columns=data_clean.columns)
+    # Standardize the data in place (z-score with the population std, as StandardScaler did)
+    data_scaled -= data_scaled.mean(axis=0)
+    sigma = data_scaled.std(axis=0)
+    data_scaled /= np.where(sigma > 0, sigma, 1.0)
+    
+    # The statistics and plotting libraries are only loaded once there is data
+    # to analyse. pyplot is loaded here, headless, so the render workers
+    # forked in step 5 inherit it instead of importing it themselves.
+    os.environ['MPLBACKEND'] = 'Agg'
+    import matplotlib.pyplot
+    from scipy.stats import chi2
+    from factor_analyzer import FactorAnalyzer
     
     # 4. Check suitability for factor analysis
     print("\n4. Checking data suitability...")
     
-    # Bartlett's test of sphericity
-    chi_square_value, p_value = calculate_bartlett_sphericity(data_scaled_df)
+    # Both tests, the scree eigenvalues and the factor fit only need the
+    # correlation matrix; the data is already z-scored, so it is one matmul
+    n_obs, n_vars = data_scaled.shape
+    corr_matrix = (data_scaled.T @ data_scaled) / n_obs
+    
+    # Bartlett's test of sphericity: -(n - 1 - (2p + 5) / 6) * ln(det(R))
+    chi_square_value = -np.log(np.linalg.det(corr_matrix)) * (n_obs - 1 - (2 * n_vars + 5) / 6)
+    p_value = chi2.sf(chi_square_value, n_vars * (n_vars - 1) / 2)
     print(f"   Bartlett's Test:")
     print(f"     Chi-square: {chi_square_value:.2f}")
     print(f"     p-value: {p_value:.4f}")
@@ -106,8 +157,13 @@ def main():
     else:
         print("     ✓ Data is suitable for factor analysis (p < 0.05)")
     
-    # KMO test
-    kmo_all, kmo_model = calculate_kmo(data_scaled_df)
+    # KMO test: squared correlations against squared partial correlations, off the diagonal
+    inv_corr = np.linalg.inv(corr_matrix)
+    partial_corr = -inv_corr / np.sqrt(np.outer(np.diag(inv_corr), np.diag(inv_corr)))
+    off_diagonal = ~np.eye(n_vars, dtype=bool)
+    corr_sq_sum = np.sum(corr_matrix[off_diagonal] ** 2)
+    partial_sq_sum = np.sum(partial_corr[off_diagonal] ** 2)
+    kmo_model = corr_sq_sum / (corr_sq_sum + partial_sq_sum)
     print(f"\n   KMO Test:")
     print(f"     Overall KMO: {kmo_model:.3f}")
     
@@ -125,23 +181,19 @@ def main():
     # 5. Determine number of factors
     print("\n5. Determining number of factors...")
     
-    # Method 1: Eigenvalues > 1 (Kaiser criterion)
-    fa = FactorAnalyzer(rotation=None, method='minres')
-    fa.fit(data_scaled_df)
-    ev, v = fa.get_eigenvalues()
+    # Method 1: Eigenvalues > 1 (Kaiser criterion), taken straight from the
+    # correlation matrix instead of an unrotated minres fit
+    ev = np.linalg.eigvalsh(corr_matrix)[::-1]
     
-    # Plot scree plot
-    plt.figure(figsize=(10, 6))
-    plt.plot(range(1, len(ev) + 1), ev, marker='o', linestyle='--')
-    plt.axhline(y=1, color='r', linestyle='-')
-    plt.title('Scree Plot for Factor Analysis')
-    plt.xlabel('Factor Number')
-    plt.ylabel('Eigenvalue')
-    plt.grid(True, alpha=0.3)
+    # Figures are rendered by worker processes (savefig is CPU-bound), so the
+    # scree plot draws while the factors are fitted. Forked workers inherit
+    # the loaded modules instead of importing them again.
+    render_executor = ProcessPoolExecutor(max_workers=3, mp_context=multiprocessing.get_context('fork'))
+    renders = {}
     
+    # Plot scree plot
     scree_plot = 'phase6_results/scree_plot.png'
-    plt.savefig(scree_plot, dpi=300)
-    plt.close()
+    renders["scree_plot.png"] = (scree_plot, render_executor.submit(render_scree, ev, scree_plot))
     
     # Count eigenvalues > 1
     n_factors_kaiser = sum(ev > 1)
@@ -162,21 +214,26 @@ def main():
     print("\n6. Performing factor analysis...")
     
     # Use Varimax rotation for better interpretability
-    fa = FactorAnalyzer(n_factors=n_factors, rotation='varimax', method='minres')
-    fa.fit(data_scaled_df)
+    # minres only needs the correlation matrix, so fit on the p x p matrix
+    # instead of the full N x p data
+    fa = FactorAnalyzer(n_factors=n_factors, rotation='varimax', method='minres', is_corr_matrix=True)
+    fa.fit(corr_matrix)
     
-    # Get factor loadings
-    loadings = fa.loadings_
+    # Get factor loadings as one C-contiguous float64 buffer
+    loadings = np.ascontiguousarray(fa.loadings_, dtype=np.float64)
     loadings_df = pd.DataFrame(
         loadings,
-        index=data_clean.columns,
+        index=feature_names,
         columns=[f'Factor_{i+1}' for i in range(n_factors)]
     )
     
+    # Absolute loadings, shared by the interpretation, plots and report
+    abs_loadings = loadings_df.abs()
+    
     # Get communalities
     communalities = fa.get_communalities()
     communalities_df = pd.DataFrame({
-        'Variable': data_clean.columns,
+        'Variable': feature_names,
         'Communality': communalities
     })
     
@@ -196,34 +253,39 @@ def main():
     factor_names = []
     factor_interpretations = []
     
+    # Variable groups used to classify each factor
+    weather_vars = pd.Index(['temperature', 'humidity', 'rain', 'wind_speed', 'visibility', 'air_pressure'])
+    traffic_vars = pd.Index(['vehicle_count', 'average_speed', 'accident_count'])
+    variable_type = {var: 'Weather' for var in weather_vars}
+    variable_type.update({var: 'Traffic' for var in traffic_vars})
+    
     for i in range(n_factors):
         factor_loadings = loadings_df[f'Factor_{i+1}']
         
         # Find variables with highest loadings on this factor
-        high_loadings = factor_loadings[abs(factor_loadings) > 0.4]
+        high_loadings = factor_loadings[abs_loadings[f'Factor_{i+1}'] > 0.4]
         
         if len(high_loadings) > 0:
             # Determine factor type based on variables
-            weather_vars = ['temperature', 'humidity', 'rain', 'wind_speed', 'visibility', 'air_pressure']
-            traffic_vars = ['vehicle_count', 'average_speed', 'accident_count']
-            
-            weather_count = sum(1 for var in high_loadings.index if var in weather_vars)
-            traffic_count = sum(1 for var in high_loadings.index if var in traffic_vars)
+            high_vars = high_loadings.index
+            weather_count = high_vars.isin(weather_vars).sum()
+            traffic_count = high_vars.isin(traffic_vars).sum()
+            strong = set(high_vars)
             
             if weather_count > traffic_count:
-                if 'rain' in high_loadings.index or 'wind_speed' in high_loadings.index:
+                if strong & {'rain', 'wind_speed'}:
                     factor_name = "Weather Severity Factor"
                     interpretation = "Represents adverse weather conditions affecting traffic"
-                elif 'temperature' in high_loadings.index:
+                elif 'temperature' in strong:
                     factor_name = "Temperature Impact Factor"
                     interpretation = "Represents temperature-related effects on traffic"
                 else:
                     factor_name = "Weather Conditions Factor"
                     interpretation = "Represents general weather impact on traffic"
-            elif 'accident_count' in high_loadings.index:
+            elif 'accident_count' in strong:
                 factor_name = "Accident Risk Factor"
                 interpretation = "Represents factors contributing to accident probability"
-            elif 'vehicle_count' in high_loadings.index and 'average_speed' in high_loadings.index:
+            elif {'vehicle_count', 'average_speed'} <= strong:
                 factor_name = "Traffic Flow Stress Factor"
                 interpretation = "Represents traffic volume and speed conditions"
             else:
@@ -238,56 +300,28 @@ def main():
     
     # Rename factors
     loadings_df.columns = factor_names
+    abs_loadings.columns = factor_names
     variance_df['Factor_Name'] = factor_names
     
     # 8. Create factor loadings heatmap
     print("\n8. Creating visualizations...")
     
-    plt.figure(figsize=(12, 8))
-    heatmap_data = loadings_df.copy()
-    
-    # Create heatmap
-    sns.heatmap(heatmap_data, annot=True, cmap='RdBu_r', center=0, 
-                fmt='.2f', linewidths=0.5, cbar_kws={'label': 'Factor Loading'})
-    plt.title('Factor Loadings Heatmap', fontsize=14, pad=20)
-    plt.tight_layout()
-    
     heatmap_file = 'phase6_results/factor_loadings_heatmap.png'
-    plt.savefig(heatmap_file, dpi=300)
-    plt.close()
-    
-    # Create bar chart of highest loadings per factor
-    plt.figure(figsize=(14, 6))
+    renders["factor_loadings_heatmap.png"] = (
+        heatmap_file, render_executor.submit(render_heatmap, loadings_df, heatmap_file))
     
-    for i, factor in enumerate(factor_names):
-        plt.subplot(1, n_factors, i + 1)
-        
-        # Get top 5 variables by absolute loading
-        factor_loadings = loadings_df[factor]
-        top_vars = factor_loadings.abs().sort_values(ascending=False).head(5).index
-        top_loadings = factor_loadings[top_vars]
-        
-        colors = ['red' if x < 0 else 'blue' for x in top_loadings]
-        plt.barh(range(len(top_vars)), top_loadings, color=colors)
-        plt.yticks(range(len(top_vars)), top_vars)
-        plt.xlabel('Factor Loading')
-        plt.title(f'{factor}\n({variance_df.loc[i, "Proportion Var"]:.1%} variance)')
-        plt.grid(True, alpha=0.3, axis='x')
-    
-    plt.tight_layout()
+    # Create bar chart of highest loadings per factor (top 5 variables by absolute loading)
+    top_vars_by_factor = [abs_loadings[factor].nlargest(5).index for factor in factor_names]
     bar_chart_file = 'phase6_results/factor_loadings_bars.png'
-    plt.savefig(bar_chart_file, dpi=300)
-    plt.close()
+    renders["factor_loadings_bars.png"] = (
+        bar_chart_file, render_executor.submit(render_bars, loadings_df, variance_df, top_vars_by_factor, bar_chart_file))
     
     # 9. Generate reports
     print("\n9. Generating reports...")
     
     # Create factor loadings table with interpretation
     loadings_table = loadings_df.copy()
-    loadings_table['Variable_Type'] = loadings_table.index.map(
-        lambda x: 'Weather' if x in ['temperature', 'humidity', 'rain', 'wind_speed', 'visibility', 'air_pressure'] 
-        else 'Traffic'
-    )
+    loadings_table['Variable_Type'] = loadings_table.index.map(variable_type)
     
     # Sort by variable type
     loadings_table = loadings_table.sort_values('Variable_Type', ascending=False)
@@ -296,100 +330,107 @@ def main():
     loadings_csv = 'phase6_results/factor_loadings.csv'
     loadings_table.to_csv(loadings_csv)
     print(f"   Saved: {loadings_csv}")
-    
-    # Create interpretation report
-    report_file = 'phase6_results/factor_analysis_report.txt'
-    with open(report_file, 'w') as f:
-        f.write("=" * 70 + "\n")
-        f.write("FACTOR ANALYSIS REPORT - Weather Impact on Traffic Patterns\n")
-        f.write("=" * 70 + "\n\n")
-        
-        f.write("1. DATA OVERVIEW\n")
-        f.write("-" * 40 + "\n")
-        f.write(f"Total records analyzed: {len(data_clean)}\n")
-        f.write(f"Variables analyzed: {len(data_clean.columns)}\n")
-        f.write(f"Bartlett's test p-value: {p_value:.4f}\n")
-        f.write(f"KMO measure: {kmo_model:.3f}\n\n")
-        
-        f.write("2. FACTOR EXTRACTION\n")
-        f.write("-" * 40 + "\n")
-        f.write(f"Number of factors extracted: {n_factors}\n")
-        f.write("Method: Minimum Residuals with Varimax Rotation\n\n")
-        
-        f.write("3. VARIANCE EXPLAINED\n")
-        f.write("-" * 40 + "\n")
-        for _, row in variance_df.iterrows():
-            f.write(f"{row['Factor_Name']}:\n")
-            f.write(f"  SS Loadings: {row['SS Loadings']:.3f}\n")
-            f.write(f"  Proportion of Variance: {row['Proportion Var']:.3f}\n")
-            f.write(f"  Cumulative Variance: {row['Cumulative Var']:.3f}\n\n")
+    uploads["factor_loadings.csv"] = upload_executor.submit(
+        client.fput_object, "gold", "factor_loadings.csv", loadings_csv)
+    
+    # Create interpretation report, assembled in memory and written in one call
+    report = []
+    write = report.append
+    write("=" * 70 + "\n")
+    write("FACTOR ANALYSIS REPORT - Weather Impact on Traffic Patterns\n")
+    write("=" * 70 + "\n\n")
+    
+    write("1. DATA OVERVIEW\n")
+    write("-" * 40 + "\n")
+    write(f"Total records analyzed: {len(data_scaled)}\n")
+    write(f"Variables analyzed: {len(feature_names)}\n")
+    write(f"Bartlett's test p-value: {p_value:.4f}\n")
+    write(f"KMO measure: {kmo_model:.3f}\n\n")
+    
+    write("2. FACTOR EXTRACTION\n")
+    write("-" * 40 + "\n")
+    write(f"Number of factors extracted: {n_factors}\n")
+    write("Method: Minimum Residuals with Varimax Rotation\n\n")
+    
+    write("3. VARIANCE EXPLAINED\n")
+    write("-" * 40 + "\n")
+    for name, ss_loadings, proportion, cumulative in zip(
+            variance_df['Factor_Name'], variance_df['SS Loadings'],
+            variance_df['Proportion Var'], variance_df['Cumulative Var']):
+        write(f"{name}:\n")
+        write(f"  SS Loadings: {ss_loadings:.3f}\n")
+        write(f"  Proportion of Variance: {proportion:.3f}\n")
+        write(f"  Cumulative Variance: {cumulative:.3f}\n\n")
+    
+    write(f"Total Variance Explained: {variance_df['Cumulative Var'].iloc[-1]:.1%}\n\n")
+    
+    write("4. FACTOR INTERPRETATIONS\n")
+    write("-" * 40 + "\n")
+    for i, (name, interpretation) in enumerate(zip(factor_names, factor_interpretations)):
+        write(f"\nFactor {i+1}: {name}\n")
+        write(f"  Interpretation: {interpretation}\n")
         
-        f.write(f"Total Variance Explained: {variance_df['Cumulative Var'].iloc[-1]:.1%}\n\n")
+        # List variables with significant loadings
+        factor_loadings = loadings_df[name]
+        significant_vars = factor_loadings[abs_loadings[name] > 0.4]
         
-        f.write("4. FACTOR INTERPRETATIONS\n")
-        f.write("-" * 40 + "\n")
-        for i, (name, interpretation) in enumerate(zip(factor_names, factor_interpretations)):
-            f.write(f"\nFactor {i+1}: {name}\n")
-            f.write(f"  Interpretation: {interpretation}\n")
-            
-            # List variables with significant loadings
-            factor_loadings = loadings_df[name]
-            significant_vars = factor_loadings[abs(factor_loadings) > 0.4]
-            
-            if len(significant_vars) > 0:
-                f.write("  Key Variables:\n")
-                for var, loading in significant_vars.items():
-                    direction = "positive" if loading > 0 else "negative"
-                    f.write(f"    • {var}: {loading:.3f} ({direction} effect)\n")
-        
-        f.write("\n5. KEY FINDINGS\n")
-        f.write("-" * 40 + "\n")
-        
-        # Find which weather variables have strongest overall impact
-        weather_loadings = loadings_table[loadings_table['Variable_Type'] == 'Weather']
-        weather_impact = {}
-        
-        for factor in factor_names:
-            weather_factor_loadings = weather_loadings[factor].abs()
-            if len(weather_factor_loadings) > 0:
-                strongest_var = weather_factor_loadings.idxmax()
-                strongest_loading = weather_factor_loadings.max()
-                weather_impact[strongest_var] = weather_impact.get(strongest_var, 0) + strongest_loading
-        
-        if weather_impact:
-            f.write("\nWeather Variables with Strongest Impact on Traffic:\n")
-            sorted_impact = sorted(weather_impact.items(), key=lambda x: x[1], reverse=True)
-            for var, impact in sorted_impact[:3]:
-                f.write(f"  1. {var}: Overall impact score = {impact:.3f}\n")
-        
-        f.write("\n6. RECOMMENDATIONS\n")
-        f.write("-" * 40 + "\n")
-        f.write("1. Monitor identified key weather variables for traffic prediction\n")
-        f.write("2. Consider factor scores for traffic management decisions\n")
-        f.write("3. Use factor analysis results to prioritize weather monitoring\n")
-        f.write("4. Incorporate factor insights into traffic forecasting models\n")
+        if len(significant_vars) > 0:
+            write("  Key Variables:\n")
+            for var, loading in significant_vars.items():
+                direction = "positive" if loading > 0 else "negative"
+                write(f"    • {var}: {loading:.3f} ({direction} effect)\n")
+    
+    write("\n5. KEY FINDINGS\n")
+    write("-" * 40 + "\n")
+    
+    # Find which weather variables have strongest overall impact: the strongest
+    # weather variable of every factor at once, summed per variable
+    weather_loadings = loadings_table[loadings_table['Variable_Type'] == 'Weather']
+    
+    if len(weather_loadings) > 0:
+        weather_abs = abs_loadings.loc[weather_loadings.index].to_numpy()
+        strongest_row = weather_abs.argmax(axis=0)
+        strongest_loading = weather_abs[strongest_row, np.arange(weather_abs.shape[1])]
+        strongest_var = weather_loadings.index.to_numpy()[strongest_row]
+        weather_impact = pd.Series(strongest_loading).groupby(strongest_var).sum().sort_values(ascending=False)
         
-        f.write("\n" + "=" * 70 + "\n")
-        f.write("Report generated by Phase 6 Factor Analysis\n")
-        f.write("=" * 70 + "\n")
+        write("\nWeather Variables with Strongest Impact on Traffic:\n")
+        for var, impact in weather_impact.head(3).items():
+            write(f"  1. {var}: Overall impact score = {impact:.3f}\n")
+    
+    write("\n6. RECOMMENDATIONS\n")
+    write("-" * 40 + "\n")
+    write("1. Monitor identified key weather variables for traffic prediction\n")
+    write("2. Consider factor scores for traffic management decisions\n")
+    write("3. Use factor analysis results to prioritize weather monitoring\n")
+    write("4. Incorporate factor insights into traffic forecasting models\n")
+    
+    write("\n" + "=" * 70 + "\n")
+    write("Report generated by Phase 6 Factor Analysis\n")
+    write("=" * 70 + "\n")
+    
+    report_file = 'phase6_results/factor_analysis_report.txt'
+    with open(report_file, 'w') as f:
+        f.write("".join(report))
     
     print(f"   Saved: {report_file}")
+    uploads["factor_analysis_report.txt"] = upload_executor.submit(
+        client.fput_object, "gold", "factor_analysis_report.txt", report_file)
     
     # 10. Upload results to MinIO Gold
     print("\n10. Uploading results to MinIO Gold layer...")
     
-    files_to_upload = [
-        (loadings_csv, "factor_loadings.csv"),
-        (report_file, "factor_analysis_report.txt"),
-        (scree_plot, "scree_plot.png"),
-        (heatmap_file, "factor_loadings_heatmap.png"),
-        (bar_chart_file, "factor_loadings_bars.png")
-    ]
+    # Figures upload as soon as their worker has written them
+    for object_name, (local_file, render) in renders.items():
+        render.result()
+        uploads[object_name] = upload_executor.submit(client.fput_object, "gold", object_name, local_file)
+    render_executor.shutdown()
     
-    for local_file, object_name in files_to_upload:
-        if os.path.exists(local_file):
-            client.fput_object("gold", object_name, local_file)
-            print(f"   Uploaded: {object_name}")
+    # The uploads were started as each file was saved; wait for all of them
+    for object_name, upload in uploads.items():
+        upload.result()
+        print(f"   Uploaded: {object_name}")
+    upload_executor.shutdown()
     
     # 11. Summary
     print("\n" + "=" * 70)
@@ -408,10 +449,9 @@ def main():
     print("-" * 40)
     
     # Calculate overall impact for each weather variable
-    weather_vars = ['temperature', 'humidity', 'rain', 'wind_speed', 'visibility', 'air_pressure']
     for var in weather_vars:
         if var in loadings_df.index:
-            var_loadings = loadings_df.loc[var].abs().sum()
+            var_loadings = abs_loadings.loc[var].sum()
             print(f"  {var}: Impact score = {var_loadings:.3f}")
     
     print("\n" + "=" * 70)
@@ -423,11 +463,70 @@ def main():
     print("  • factor_loadings_bars.png")
     print("=" * 70)
 
+def render_scree(ev, path):
+    """Plot the eigenvalues against the Kaiser threshold"""
+    import matplotlib.pyplot as plt
+    
+    plt.figure(figsize=(10, 6))
+    plt.plot(range(1, len(ev) + 1), ev, marker='o', linestyle='--')
+    plt.axhline(y=1, color='r', linestyle='-')
+    plt.title('Scree Plot for Factor Analysis')
+    plt.xlabel('Factor Number')
+    plt.ylabel('Eigenvalue')
+    plt.grid(True, alpha=0.3)
+    
+    plt.savefig(path, dpi=150, pil_kwargs={'compress_level': 1})
+    plt.close()
+
+def render_heatmap(loadings_df, path):
+    """Plot the factor loadings heatmap"""
+    import matplotlib.pyplot as plt
+    
+    fig, ax = plt.subplots(figsize=(12, 8))
+    values = loadings_df.to_numpy()
+    
+    # Create heatmap as one image; loadings lie in [-1, 1], centred on 0
+    im = ax.imshow(values, cmap='RdBu_r', vmin=-1, vmax=1, aspect='auto')
+    ax.set_xticks(range(values.shape[1]))
+    ax.set_xticklabels(loadings_df.columns)
+    ax.set_yticks(range(values.shape[0]))
+    ax.set_yticklabels(loadings_df.index)
+    for (i, j), value in np.ndenumerate(values):
+        ax.text(j, i, f"{value:.2f}", ha='center', va='center',
+                color='white' if abs(value) > 0.6 else 'black')
+    fig.colorbar(im, ax=ax, label='Factor Loading')
+    ax.set_title('Factor Loadings Heatmap', fontsize=14, pad=20)
+    fig.tight_layout()
+    
+    plt.savefig(path, dpi=150, pil_kwargs={'compress_level': 1})
+    plt.close()
+
+def render_bars(loadings_df, variance_df, top_vars_by_factor, path):
+    """Plot the highest loadings of each factor side by side"""
+    import matplotlib.pyplot as plt
+    
+    plt.figure(figsize=(14, 6))
+    n_factors = len(loadings_df.columns)
+    
+    for i, (factor, top_vars) in enumerate(zip(loadings_df.columns, top_vars_by_factor)):
+        plt.subplot(1, n_factors, i + 1)
+        
+        top_loadings = loadings_df.loc[top_vars, factor].to_numpy()
+        
+        positions = np.arange(len(top_loadings))
+        plt.barh(positions, top_loadings, color=np.where(top_loadings < 0, 'red', 'blue'))
+        plt.yticks(positions, top_vars)
+        plt.xlabel('Factor Loading')
+        plt.title(f'{factor}\n({variance_df.loc[i, "Proportion Var"]:.1%} variance)')
+        plt.grid(True, alpha=0.3, axis='x')
+    
+    plt.tight_layout()
+    plt.savefig(path, dpi=150, pil_kwargs={'compress_level': 1})
+    plt.close()
+
 if __name__ == "__main__":
-    # Check if factor_analyzer is installed
-    try:
-        from factor_analyzer import FactorAnalyzer
-    except ImportError:
+    # Check if factor_analyzer is installed (without importing it yet)
+    if importlib.util.find_spec('factor_analyzer') is None:
         print("Error: factor_analyzer package not installed.")
         print("Install with: pip install factor_analyzer")
         exit(1)